@@ -1,7 +1,35 @@
 import multiprocessing
+import os
+import subprocess
+import sys
 
 pythonpath = 'src'
 bind = '0.0.0.0:3100'
 workers = multiprocessing.cpu_count() # * 2 + 1
 worker_class = 'uvicorn.workers.UvicornWorker'
-timeout = 600 # 600s startup time for database actions
\ No newline at end of file
+timeout = 600 # 600s startup time for database actions
+
+# build or refresh the index snapshot once in the master, the workers attach to it read-only
+os.environ.setdefault("SHARED_INDEX", "true")
+# load the weights of the classification model once in the master, the forked workers share them
+os.environ.setdefault("SHARED_MODEL", "true")
+
+
+def on_starting(server):
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+    # run in separate processes, so the master does not start the thread pools of torch before forking the workers
+    # download the model and the nltk resources once, the workers load the local copies
+    subprocess.run([sys.executable, os.path.join(src, "utils", "resource_manager.py")], check=True)
+    if os.environ["SHARED_INDEX"].lower() != "true":
+        return
+    subprocess.run([sys.executable, os.path.join(src, "information_retrieval", "index_builder.py")], check=True)
+
+
+def when_ready(server):
+    if os.environ["SHARED_MODEL"].lower() != "true":
+        return
+    # runs after on_starting, the model is already stored on the host
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+    from utils.classification import preload_classification_model
+
+    preload_classification_model()
@@ -1,4 +1,4 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Response
 from prisma import models
 from typing import List
 from information_retrieval.token_vector_space_model import (
@@ -7,6 +7,8 @@ from information_retrieval.token_vector_space_model import (
 from information_retrieval.classified_vector_space_model import (
     search_classified_vector_space_model,
 )
+from utils.inference_executor import InferenceQueueFullError, inference_timings
+from utils.query_cache import local_cache as query_cache
 
 router = APIRouter()
 
@@ -15,9 +17,10 @@ router = APIRouter()
     "/search/classifier/actor",
     responses={
         429: {"description": "Too Many Requests"},
+        503: {"description": "Inference Queue Full"},
     },
 )
-async def search_classifier_actor(q: str) -> List[models.Actor]:
+async def search_classifier_actor(q: str, response: Response) -> List[models.Actor]:
     """
     Search for actors by classifier vector space.<br>
     Example usage: http://127.0.0.1:8000/search/classifier/actor?q=handsome%20man
@@ -26,13 +29,35 @@ async def search_classifier_actor(q: str) -> List[models.Actor]:
     print(f"Query: {query}")
 
     # search classified vector space model
-    actors = await search_classified_vector_space_model(query)
+    try:
+        actors = await search_classified_vector_space_model(query)
+    except InferenceQueueFullError as e:
+        print(f"Rejecting query: {e}")
+        raise HTTPException(status_code=503, detail="Too many pending queries")
+
+    # expose the queue wait and inference time of the query classification
+    timings = inference_timings.get(None)
+    if timings is not None:
+        response.headers["Server-Timing"] = ", ".join(
+            f"{name};dur={duration:.1f}" for name, duration in timings.items()
+        )
+        print(
+            f"queue wait: {timings['queue']:.1f} ms, inference: {timings['inference']:.1f} ms"
+        )
 
     print(f"returning {len(actors)} actors")
 
     return actors
 
 
+@router.get("/search/classifier/cache")
+async def search_classifier_cache() -> dict:
+    """
+    Size and hit/miss counters of the query vector cache of this worker.
+    """
+    return query_cache.stats()
+
+
 @router.get(
     "/search/token/actor",
     responses={
@@ -8,14 +8,36 @@ load_dotenv()
 # Flask Environment
 FASTAPI_ENV = os.getenv("FASTAPI_ENV")
 
+# Database, one pooled client per worker
+DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_CONNECTION_LIMIT = int(os.getenv("DATABASE_CONNECTION_LIMIT", 5))
+DATABASE_POOL_TIMEOUT = int(os.getenv("DATABASE_POOL_TIMEOUT", 10))  # seconds
+DATABASE_CONNECT_TIMEOUT = int(os.getenv("DATABASE_CONNECT_TIMEOUT", 10))  # seconds
+DATABASE_QUERY_TIMEOUT = int(os.getenv("DATABASE_QUERY_TIMEOUT", 30))  # seconds
+SCRIPT_UPDATE_BATCH_SIZE = 1000  # scripts per UPDATE statement
+SCRIPT_PAGE_SIZE = 1000  # scripts per page of the preprocessing
+
+# Preprocessing of the scripts, runs in a process pool
+PREPROCESSING_WORKERS = int(os.getenv("PREPROCESSING_WORKERS") or os.cpu_count() or 1)
+PREPROCESSING_CHUNK_SIZE = 100  # scripts per worker task
+PREPROCESSING_PENDING_PAGES = 2  # pages preprocessed ahead of the write-back
+LEMMA_CACHE_SIZE = 100000  # distinct tokens with a cached lemma per process
+
 # General paths
 CWD = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 FILES_PATH = os.path.join(CWD, "files")
 DATA_PATH = os.path.join(CWD, "data")
 
 # File Paths
-VOCABULARY_FILE_PATH = os.path.join(FILES_PATH, "vocabulary.csv")
-TERM_DOC_FREQ_FILE_PATH = os.path.join(FILES_PATH, "term_freq_map.csv")
+VOCABULARY_FILE_PATH = os.path.join(FILES_PATH, "vocabulary.bin")
+PREPROCESSING_STATE_FILE_PATH = os.path.join(FILES_PATH, "preprocessing_state.json")
+INDEX_SNAPSHOT_VERSION = 2
+INDEX_SNAPSHOT_PATH = os.path.join(FILES_PATH, "index_snapshot")
+INDEX_SNAPSHOT_VERIFY_CHECKSUMS = (
+    os.getenv("INDEX_SNAPSHOT_VERIFY_CHECKSUMS", "true").lower() == "true"
+)
+# Workers attach to the snapshot built once by the gunicorn master instead of building their own
+SHARED_INDEX = os.getenv("SHARED_INDEX", "false").lower() == "true"
 
 GROUND_DATASET_FILE_PATH = os.path.join(FILES_PATH, "top_20_actors.csv")
 EVAL_MEASURES_IMAGE_PATH = os.path.join(FILES_PATH, "evaluation_measures.png")
@@ -23,6 +45,55 @@ EVAL_MEASURES_CSV_PATH = os.path.join(FILES_PATH, "evaluation_measures.csv")
 
 FAME_COEFFICIENT_PERCENTAGE = 0.25
 
+# Number of actors returned by a search
+SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", 100))
+
+# Build the token vector space model and its SVD, next to the classified model
+TOKEN_MODEL_ENABLED = os.getenv("TOKEN_MODEL_ENABLED", "false").lower() == "true"
+
+# Model inference of the search queries, runs in a thread pool off the event loop
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", 1))
+# queries wait for a free inference thread in a queue of INFERENCE_MAX_QUEUE_DEPTH * MICRO_BATCH_MAX_SIZE texts,
+# once it is full requests are answered with 503
+INFERENCE_MAX_QUEUE_DEPTH = int(os.getenv("INFERENCE_MAX_QUEUE_DEPTH", 32))
+# Concurrent queries arriving within the window are classified as one batch
+MICRO_BATCH_WINDOW_MS = float(os.getenv("MICRO_BATCH_WINDOW_MS", 5))
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", 16))
+
+# Emotion classification model of the dialogues and the queries
+CLASSIFICATION_MODEL_NAME = "zbnsl/bert-base-uncased-emotionsModified"
+# revision of the model on the hub, set a commit hash to pin the weights
+CLASSIFICATION_MODEL_REVISION = os.getenv("CLASSIFICATION_MODEL_REVISION", "main")
+# local copies of the model and the nltk resources, downloaded once per host
+MODEL_CACHE_PATH = os.getenv("MODEL_CACHE_PATH", os.path.join(FILES_PATH, "models"))
+NLTK_DATA_PATH = os.getenv("NLTK_DATA_PATH", os.path.join(FILES_PATH, "nltk_data"))
+CLASSIFICATION_BACKEND = os.getenv("CLASSIFICATION_BACKEND", "pytorch")  # pytorch, torchscript or onnx
+CLASSIFICATION_QUANTIZE = os.getenv("CLASSIFICATION_QUANTIZE", "false").lower() == "true"  # dynamic int8
+CLASSIFICATION_INTRA_OP_THREADS = int(os.getenv("CLASSIFICATION_INTRA_OP_THREADS", 0))  # 0 = library default
+CLASSIFICATION_ONNX_PATH = os.path.join(FILES_PATH, "onnx")  # exported onnx models
+
+# Classification of the actor dialogues when building the index
+CLASSIFICATION_BATCH_SIZE = int(os.getenv("CLASSIFICATION_BATCH_SIZE", 32))  # chunks per forward pass
+CLASSIFICATION_THREADS = int(os.getenv("CLASSIFICATION_THREADS") or os.cpu_count() or 1)  # torch threads
+CLASSIFICATION_ACTOR_PAGE_SIZE = 200  # actors classified and stored together
+CLASSIFICATION_CHUNK_OVERLAP = int(os.getenv("CLASSIFICATION_CHUNK_OVERLAP", 0))  # tokens repeated in the next chunk
+
+# Cache of the query vectors, keyed by the normalized query text
+QUERY_CACHE_MAX_SIZE = int(os.getenv("QUERY_CACHE_MAX_SIZE", 10000))
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", 24 * 60 * 60))  # seconds
+QUERY_CACHE_REDIS_URL = os.getenv("QUERY_CACHE_REDIS_URL")  # shared by all workers, e.g. redis://localhost:6379
+
+# In-process store of the complete actor data returned by the searches
+ACTOR_STORE_MAX_SIZE = int(os.getenv("ACTOR_STORE_MAX_SIZE", 20000))
+ACTOR_STORE_TTL = int(os.getenv("ACTOR_STORE_TTL", 60 * 60))  # seconds
+ACTOR_STORE_PRELOAD = os.getenv("ACTOR_STORE_PRELOAD", "false").lower() == "true"
+
+# Singular Value Decomposition of the token vector space model
+SVD_MODE = os.getenv("SVD_MODE", "randomized")  # randomized or full
+SVD_COMPONENTS = int(os.getenv("SVD_COMPONENTS", 0))  # fixed k, 0 = energy based k
+SVD_MAX_COMPONENTS = 300  # upper bound for the energy based k
+SVD_ENERGY_THRESHOLD = 0.9
+
 # ---------------------------- START DATA CRAWLING ----------------------------
 # URL´s
 IMDB_URL = "https://www.imdb.com"
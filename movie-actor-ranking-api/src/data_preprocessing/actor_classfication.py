@@ -1,175 +1,255 @@
-from typing import List, Dict, Union
+import hashlib
+from typing import List, Tuple
+import numpy as np
+import torch
 from prisma import models
-from db.actor_classifier import create_many_actor_classifiers, get_all_actor_classifiers
-from db.actor import get_all_actors_dialogues
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from db.actor_classifier import create_many_actor_classifiers
+from db.actor import count_unclassified_actors, get_unclassified_actors_dialogues
+from db.chunk_classification import create_many_chunk_scores, get_chunk_scores
 from tqdm import tqdm
-from utils.classification import get_classification
-import os
+from utils.classification import (
+    classify_token_ids,
+    get_classification_labels,
+    get_classification_model_key,
+    get_classification_tokenizer,
+    get_max_chunk_tokens,
+)
+from config import (
+    CLASSIFICATION_BATCH_SIZE,
+    CLASSIFICATION_THREADS,
+    CLASSIFICATION_ACTOR_PAGE_SIZE,
+    CLASSIFICATION_CHUNK_OVERLAP,
+)
 import asyncio
 
+EMOTION_LABELS = ["sadness", "joy", "anger", "fear", "surprise", "love"]
+EMOTION_LABEL_INDEX = {label: index for index, label in enumerate(EMOTION_LABELS)}
+# emotion label -> column of the actor classifier
+SCORE_FIELDS = {
+    "sadness": "sadnessScore",
+    "joy": "joyScore",
+    "anger": "angerScore",
+    "fear": "fearScore",
+    "surprise": "surpriseScore",
+    "love": "loveScore",
+}
+
 
 def split_text_into_chunks(
-    text: str, split_by: str = ".", max_length: int = 512
-) -> List[str]:
+    text: str,
+    max_tokens: int,
+    overlap_tokens: int = CLASSIFICATION_CHUNK_OVERLAP,
+    split_by: str = ".",
+) -> List[Tuple[str, List[int]]]:
     """
-    Split text into chunks of a specified maximum length, without splitting sentences.
+    Split text into chunks of whole sentences that fill the token budget of the model.
+    A sentence longer than the budget is split into windows of tokens.
 
     Args:
         text (str): The text to split.
-        max_length (int): The maximum length of each chunk.
+        max_tokens (int): The maximum number of tokens of each chunk, without the special tokens.
+        overlap_tokens (int): Tokens at the end of a chunk that are repeated at the start of the next one,
+            clamped to 0 <= overlap_tokens < max_tokens.
 
     Returns:
-        List[str]: A list of text chunks.
+        List[Tuple[str, List[int]]]: A list of (chunk text, token ids of the chunk).
     """
-    sentences = text.split(split_by)
+    # an overlap of the whole budget would never advance past the first window
+    overlap_tokens = min(max(overlap_tokens, 0), max_tokens - 1)
+    sentences = [
+        sentence.strip() + split_by for sentence in text.split(split_by) if sentence.strip()
+    ]
+    if not sentences:
+        return []
+    tokenizer = get_classification_tokenizer()
+    sentence_token_ids = tokenizer(sentences, add_special_tokens=False)["input_ids"]
+
     chunks = []
-    current_chunk = ""
-
-    for sentence in sentences:
-        # Add 1 for the period at the end of the sentence
-        if len(current_chunk) + len(sentence) + 1 > max_length:
-            # If the current sentence is longer than max_length, split it into smaller chunks
-            if len(sentence) > max_length:
-                for i in range(0, len(sentence), max_length):
-                    chunks.append(sentence[i : i + max_length])
-            else:
-                chunks.append(current_chunk)
-                current_chunk = sentence
-        else:
-            current_chunk += (split_by if current_chunk else "") + sentence
-
-    if current_chunk:
-        chunks.append(current_chunk)
+    current_sentences = []  # (sentence, token ids) of the current chunk
+    current_length = 0
+
+    def add_chunk(chunk_sentences: List[Tuple[str, List[int]]]) -> None:
+        chunks.append(
+            (
+                " ".join(sentence for sentence, _ in chunk_sentences),
+                [token_id for _, ids in chunk_sentences for token_id in ids],
+            )
+        )
+
+    for sentence, ids in zip(sentences, sentence_token_ids):
+        if len(ids) > max_tokens:
+            # If the current sentence is longer than max_tokens, split it into windows
+            if current_sentences:
+                add_chunk(current_sentences)
+                current_sentences, current_length = [], 0
+            step = max_tokens - overlap_tokens
+            for i in range(0, len(ids) - overlap_tokens, step):
+                window = ids[i : i + max_tokens]
+                chunks.append((tokenizer.decode(window), window))
+            continue
+
+        if current_length + len(ids) > max_tokens:
+            add_chunk(current_sentences)
+            # repeat the last sentences of the chunk that fit into the overlap
+            overlap_sentences = []
+            overlap_length = 0
+            for previous_sentence, previous_ids in reversed(current_sentences):
+                if overlap_length + len(previous_ids) > overlap_tokens:
+                    break
+                overlap_sentences.insert(0, (previous_sentence, previous_ids))
+                overlap_length += len(previous_ids)
+            if overlap_length + len(ids) > max_tokens:
+                overlap_sentences, overlap_length = [], 0
+            current_sentences, current_length = overlap_sentences, overlap_length
+
+        current_sentences.append((sentence, ids))
+        current_length += len(ids)
+
+    if current_sentences:
+        add_chunk(current_sentences)
 
     return chunks
 
 
-def classify_actor_dialogues(
-    actors: List[models.Actor],
-) -> Dict[int, Dict[str, List[float]]]:
+def get_actor_dialogue(actor: models.Actor) -> str:
+    """
+    Concatenate all dialogues of an actor
     """
-    Classify the dialogues of actors and return the classification results.
+    return ".".join(
+        script.dialogue for role in actor.roles for script in role.scripts if script.dialogue
+    )
 
-    Args:
-        actor_dialogues (List[Dict[str, Union[int, str]]]): List of actor dialogues.
 
-    Returns:
-        Dict[int, Dict[str, List[float]]]: Classification results for each actor.
+def classify_chunks(chunk_token_ids: List[List[int]]) -> np.ndarray:
+    """
+    Classify a batch of tokenized chunks and return their scores in the order of EMOTION_LABELS
     """
-    actor_classifications = {}
+    scores = classify_token_ids(chunk_token_ids)
+    label_columns = [
+        EMOTION_LABEL_INDEX[label] for label in get_classification_labels()
+    ]
+    ordered_scores = np.zeros((len(chunk_token_ids), len(EMOTION_LABELS)))
+    ordered_scores[:, label_columns] = scores
+    return ordered_scores
 
-    for actor in actors:
-        actor_id = actor.id
 
-        # Concatenate all dialogues of the actor
-        all_dialogues = ".".join(
-            script.dialogue
-            for role in actor.roles
-            for script in role.scripts
-            if script.dialogue
-        )
-
-        dialogue_chunks = split_text_into_chunks(all_dialogues)
+def hash_chunk(chunk: str) -> str:
+    """
+    Hash the text of a chunk together with the model, the key of the cached chunk scores
+    """
+    return hashlib.sha256(
+        f"{get_classification_model_key()}\0{chunk}".encode("utf-8")
+    ).hexdigest()
 
-        classifications = get_classification(dialogue_chunks)
 
-        if actor_id not in actor_classifications:
-            actor_classifications[actor_id] = {
-                "sadness": [],
-                "joy": [],
-                "anger": [],
-                "fear": [],
-                "surprise": [],
-                "love": [],
-            }
+async def classify_actor_dialogues(actors: List[models.Actor]) -> np.ndarray:
+    """
+    Classify the dialogues of the actors together and return the mean scores of every actor.
+    Only chunks without cached scores are classified, sorted by their number of tokens
+    so the chunks of a batch are padded to similar lengths.
 
-        for classification in classifications:
-            for label_score in classification:
-                label = label_score["label"]
-                score = label_score["score"]
-                actor_classifications[actor_id][label].append(score)
+    Returns:
+        np.ndarray: mean scores in the order of EMOTION_LABELS, one row per actor.
+    """
+    max_tokens = get_max_chunk_tokens()
+    chunk_hashes = []
+    chunk_actors = []  # row of the actor of every chunk
+    chunk_token_ids = {}  # hash -> token ids of the distinct chunks
+    for row, actor in enumerate(actors):
+        for chunk, token_ids in split_text_into_chunks(
+            get_actor_dialogue(actor), max_tokens
+        ):
+            chunk_hash = hash_chunk(chunk)
+            chunk_hashes.append(chunk_hash)
+            chunk_actors.append(row)
+            chunk_token_ids[chunk_hash] = token_ids
+
+    chunk_scores = await get_chunk_scores(list(chunk_token_ids))
+    missing_hashes = sorted(
+        (chunk_hash for chunk_hash in chunk_token_ids if chunk_hash not in chunk_scores),
+        key=lambda chunk_hash: len(chunk_token_ids[chunk_hash]),
+    )
+
+    new_chunk_scores = {}
+    loop = asyncio.get_running_loop()
+    for start in range(0, len(missing_hashes), CLASSIFICATION_BATCH_SIZE):
+        batch = missing_hashes[start : start + CLASSIFICATION_BATCH_SIZE]
+        scores = await loop.run_in_executor(
+            None, classify_chunks, [chunk_token_ids[chunk_hash] for chunk_hash in batch]
+        )
+        new_chunk_scores.update(zip(batch, scores.tolist()))
+
+    if new_chunk_scores:
+        await create_many_chunk_scores(new_chunk_scores)
+        chunk_scores.update(new_chunk_scores)
+    print(
+        f"Classified {len(new_chunk_scores)} chunks, "
+        f"{len(chunk_token_ids) - len(new_chunk_scores)} chunks were cached"
+    )
+
+    score_sums = np.zeros((len(actors), len(EMOTION_LABELS)))
+    chunk_counts = np.zeros(len(actors))
+    if chunk_hashes:
+        np.add.at(
+            score_sums,
+            chunk_actors,
+            np.array([chunk_scores[chunk_hash] for chunk_hash in chunk_hashes]),
+        )
+        np.add.at(chunk_counts, chunk_actors, 1)
 
-    return actor_classifications
+    # actors without chunks keep the score 0
+    return np.divide(
+        score_sums,
+        chunk_counts[:, np.newaxis],
+        out=np.zeros_like(score_sums),
+        where=chunk_counts[:, np.newaxis] > 0,
+    )
 
 
 async def classify_actors():
     """
-    Classify all actors based on their dialogues and store the results in the database.
+    Classify the actors without a classifier based on their dialogues and store the results in the database.
+    The actors are classified page by page and every page is stored at once,
+    so an interrupted run continues with the actors that are not classified yet.
     """
     print("Classifying actors...")
 
-    # Get all actor dialogues from the database
-    actor_dialogues = await get_all_actors_dialogues()
-    actors_classified = await get_all_actor_classifiers()
-
-    if len(actor_dialogues) == len(actors_classified):
+    unclassified_actors_count = await count_unclassified_actors()
+    if unclassified_actors_count == 0:
         print("All actors are already classified.")
         return
 
-    actors_classification = {}  # Dictionary to store the classification of each actor
-
-    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-        loop = asyncio.get_event_loop()
-        futures = [
-            loop.run_in_executor(executor, classify_actor_dialogues, [actor_dialogue])
-            for actor_dialogue in actor_dialogues
-        ]
-        for future in tqdm(as_completed(futures), total=len(futures)):
-            batch_classifications = await future
-            for actor_id, classification in batch_classifications.items():
-                if actor_id not in actors_classification:
-                    actors_classification[actor_id] = {
-                        "sadness": [],
-                        "joy": [],
-                        "anger": [],
-                        "fear": [],
-                        "surprise": [],
-                        "love": [],
-                    }
-                for label, scores in classification.items():
-                    actors_classification[actor_id][label].extend(scores)
-
-    # Prepare data for bulk insertion
-    actor_classifiers = []
-    for actor_id, classification in actors_classification.items():
-        actor_classifiers.append(
-            {
-                "actorId": actor_id,
-                "loveScore": (
-                    sum(classification["love"]) / len(classification["love"])
-                    if len(classification["love"]) > 0
-                    else 0
-                ),
-                "joyScore": (
-                    sum(classification["joy"]) / len(classification["joy"])
-                    if len(classification["joy"]) > 0
-                    else 0
-                ),
-                "angerScore": (
-                    sum(classification["anger"]) / len(classification["anger"])
-                    if len(classification["anger"]) > 0
-                    else 0
-                ),
-                "sadnessScore": (
-                    sum(classification["sadness"]) / len(classification["sadness"])
-                    if len(classification["sadness"]) > 0
-                    else 0
-                ),
-                "surpriseScore": (
-                    sum(classification["surprise"]) / len(classification["surprise"])
-                    if len(classification["surprise"]) > 0
-                    else 0
-                ),
-                "fearScore": (
-                    sum(classification["fear"]) / len(classification["fear"])
-                    if len(classification["fear"]) > 0
-                    else 0
-                ),
-            }
-        )
-
-    # Bulk insert actor classifiers
-    await create_many_actor_classifiers(actor_classifiers)
-
-    print("All actors classified successfully.")
\ No newline at end of file
+    # one inference thread that uses the cores for the matrix operations of the batches
+    previous_threads = torch.get_num_threads()
+    torch.set_num_threads(CLASSIFICATION_THREADS)
+    try:
+        after_id = 0
+        with tqdm(total=max(unclassified_actors_count, 0)) as progress:
+            while True:
+                actors = await get_unclassified_actors_dialogues(
+                    after_id, CLASSIFICATION_ACTOR_PAGE_SIZE
+                )
+                if not actors:
+                    break
+                after_id = actors[-1].id
+
+                mean_scores = await classify_actor_dialogues(actors)
+
+                # Bulk insert the actor classifiers of the page
+                await create_many_actor_classifiers(
+                    [
+                        {
+                            "actorId": actor.id,
+                            **{
+                                SCORE_FIELDS[label]: float(mean_scores[row, column])
+                                for column, label in enumerate(EMOTION_LABELS)
+                            },
+                        }
+                        for row, actor in enumerate(actors)
+                    ]
+                )
+                progress.update(len(actors))
+    finally:
+        torch.set_num_threads(previous_threads)
+
+    print("All actors classified successfully.")
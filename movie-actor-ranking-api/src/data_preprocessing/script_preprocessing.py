@@ -1,193 +1,197 @@
-import re
-from typing import Dict, List, Set, Tuple
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from prisma import models
+import os
+import json
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
 from db.script import (
-    get_all_scripts,
-    update_scripts,
+    count_scripts,
+    get_processed_dialogues,
+    get_unprocessed_scripts,
+    update_processed_dialogues,
 )
+from data_preprocessing.text_preprocessing import (
+    init_text_preprocessing,
+    preprocess_dialogues,
+    preprocess_text,
+)
+from utils.vocabulary import Vocabulary
+from utils.resource_manager import ensure_nltk_resources
 import globals
-import csv
-from config import VOCABULARY_FILE_PATH, TERM_DOC_FREQ_FILE_PATH
+from config import (
+    VOCABULARY_FILE_PATH,
+    PREPROCESSING_STATE_FILE_PATH,
+    SCRIPT_PAGE_SIZE,
+    PREPROCESSING_WORKERS,
+    PREPROCESSING_CHUNK_SIZE,
+    PREPROCESSING_PENDING_PAGES,
+)
 
 vocabulary_file_path = VOCABULARY_FILE_PATH
-term_doc_freq_file_path = TERM_DOC_FREQ_FILE_PATH
+preprocessing_state_file_path = PREPROCESSING_STATE_FILE_PATH
 
 
 async def preprocess_scripts():
     """
-    Preprocesses the scripts in the database and returns a list of tokens.
+    Preprocesses the new scripts in the database and updates the vocabulary of the whole corpus.
     """
     print("Start Preprocessing")
 
-    download_nltk_resources()
-
-    # Get the scripts from the database
-    scripts = await get_all_scripts()
-    processed_scripts = [
-        script for script in scripts if script.processedDialogue is not None
-    ]  # get all scripts that are already preprocessed
-
-    if len(scripts) != len(processed_scripts):
-        # Preprocess the scripts
-        print("Not all scripts are preprocessed, start preprocessing:")
-        unprocessed_scripts = [
-            script for script in scripts if script not in processed_scripts
-        ]
-        new_processed_scripts, list_of_tokens = await preprocess_and_update_scripts(
-            unprocessed_scripts
-        )
-        processed_scripts.extend(new_processed_scripts)
+    ensure_nltk_resources()
+
+    # term counts of all scripts preprocessed so far
+    corpus_vocabulary = await load_corpus_vocabulary()
+
+    unprocessed_scripts_count = await count_scripts() - await count_scripts(
+        processed_only=True
+    )
+    if unprocessed_scripts_count > 0:
+        # Preprocess only the new scripts
+        print(f"{unprocessed_scripts_count} scripts are not preprocessed, start preprocessing:")
+        await preprocess_and_update_scripts(corpus_vocabulary)
     else:
         # all scripts are already preprocessed
         print("Scripts are already preprocessed")
-        list_of_tokens = await load_vocabulary()
 
-    globals._vocabulary = list_of_tokens
+    globals._corpus_vocabulary = corpus_vocabulary
+    globals._vocabulary = handle_tokens(corpus_vocabulary)
 
-    print(str(len(processed_scripts)) + " scripts came trough the preprocessing")
     print("Length of Vocabulary: " + str(len(globals._vocabulary)))
     print("Preprocessing completed")
 
 
-def download_nltk_resources():
+def handle_tokens(corpus_vocabulary: Vocabulary) -> Vocabulary:
     """
-    Download the necessary NLTK resources.
+    Handle tokens: the vocabulary are all tokens that occur more than once.
     """
-    nltk.download("punkt")
-    nltk.download("wordnet")
-    nltk.download("stopwords")
-    nltk.download("words")
+    return corpus_vocabulary.prune(min_count=2)
 
 
-def handle_tokens(term_freq_map: Dict[str, int], tokens: List[str]) -> List[str]:
+async def preprocess_and_update_scripts(corpus_vocabulary: Vocabulary) -> int:
     """
-    Handle tokens: filter out unique tokens.
+    Preprocesses the unprocessed scripts page by page in a process pool, writes them to
+    the database and merges their tokens into the term counts of the corpus.
+    The next pages are read and preprocessed while a finished page is written back.
     """
-    # Find tokens that occur only once
-    unique_tokens = [key for key, value in term_freq_map.items() if value == 1]
-    tokens = [token for token in tokens if token not in unique_tokens]
-
-    # Remove duplicates
-    tokens = list(set(tokens))
-    return tokens
-
-
-async def preprocess_and_update_scripts(
-    scripts: List[models.Script],
-) -> Tuple[List[models.Script], List[str]]:
-    """
-    Preprocesses the posts and inserts them into the database.
+    processed_scripts_count = 0
+    after_id = 0
+    pending_pages = deque()
+    loop = asyncio.get_running_loop()
+
+    with ProcessPoolExecutor(
+        max_workers=PREPROCESSING_WORKERS, initializer=init_text_preprocessing
+    ) as executor:
+        while True:
+            scripts = await get_unprocessed_scripts(after_id, SCRIPT_PAGE_SIZE)
+            if scripts:
+                after_id = scripts[-1].id
+                dialogues = [(script.id, script.dialogue) for script in scripts]
+                # fan the page out to the workers in chunks
+                pending_pages.append(
+                    asyncio.gather(
+                        *(
+                            loop.run_in_executor(
+                                executor,
+                                preprocess_dialogues,
+                                dialogues[i : i + PREPROCESSING_CHUNK_SIZE],
+                            )
+                            for i in range(0, len(dialogues), PREPROCESSING_CHUNK_SIZE)
+                        )
+                    )
+                )
+
+            # write back the oldest pages, all of them once every page is read
+            while pending_pages and (
+                not scripts or len(pending_pages) > PREPROCESSING_PENDING_PAGES
+            ):
+                chunks = await pending_pages.popleft()
+                processed_tokens = [result for chunk in chunks for result in chunk]
+                if not await write_processed_page(processed_tokens, corpus_vocabulary):
+                    # the stored term counts no longer match, they are counted again on the next run
+                    print("Not all processed dialogues were written, stop preprocessing")
+                    for page in pending_pages:
+                        page.cancel()
+                    return processed_scripts_count
+                processed_scripts_count += len(processed_tokens)
+                print(f"{processed_scripts_count} scripts came trough the preprocessing")
+
+            if not scripts:
+                break
+
+    return processed_scripts_count
+
+
+async def write_processed_page(
+    processed_tokens: List[Tuple[int, List[str]]], corpus_vocabulary: Vocabulary
+) -> bool:
     """
-    # Initialize the variables
-    list_of_tokens = []
-    processed_scripts = []
-    term_freq_map = {}
-
-    english_words = set(nltk.corpus.words.words())
-
-    for script in scripts:
-        # Preprocess the script
-        processed_script, tokens = preprocess_script(script, english_words)
-
-        if not processed_script:  # if the processed_script is empty
-            continue
-
-        # Add to processed_script list
-        processed_scripts.append(processed_script)
-
-        set_term_freq_map(term_freq_map, tokens)
+    Write a page of processed dialogues to the database and merge its terms into the term counts.
 
-        list_of_tokens.extend(tokens)
-
-    list_of_tokens = handle_tokens(term_freq_map, list_of_tokens)
-    globals._document_frequency = term_freq_map
-
-    # update the script in the datebase
-    await update_scripts(processed_scripts)
-
-    # Store list_of_tokens in a CSV file
-    with open(vocabulary_file_path, "w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(list_of_tokens)
+    :param processed_tokens: List of (script id, tokens)
+    :return: whether all processed dialogues were written
+    """
+    # update the processed dialogues in the datebase
+    updated = await update_processed_dialogues(
+        [(script_id, " ".join(tokens)) for script_id, tokens in processed_tokens]
+    )
+    if updated != len(processed_tokens):
+        return False
 
-    # Store term_freq_map in a CSV file
-    with open(term_doc_freq_file_path, "w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        for token, freq in term_freq_map.items():
-            writer.writerow([token, freq])
-    return processed_scripts, list_of_tokens
+    # merge the terms of the page and store them, so they match the database
+    corpus_vocabulary.add_tokens(
+        token for _, tokens in processed_tokens for token in tokens
+    )
+    await store_corpus_vocabulary(corpus_vocabulary)
+    return True
 
 
-async def load_vocabulary() -> List[str]:
+async def store_corpus_vocabulary(corpus_vocabulary: Vocabulary) -> None:
     """
-    lLoad the vocabulary and the processed scripts from CSV files.
+    Store the terms and their counts of the corpus.
     """
-    list_of_tokens = []
-    term_freq_map = {}
-
-    # Load list_of_tokens from CSV file
-    with open(vocabulary_file_path, "r", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        for row in reader:
-            list_of_tokens.extend(row)
-
-    # Load term_freq_map from CSV file
-    with open(term_doc_freq_file_path, "r", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        for row in reader:
-            token, freq = row
-            term_freq_map[token] = int(freq)
+    corpus_vocabulary.save(vocabulary_file_path)
 
-    list_of_tokens = handle_tokens(term_freq_map, list_of_tokens)
-    globals._document_frequency = term_freq_map
+    # Store the number of scripts the term counts are based on
+    with open(preprocessing_state_file_path, "w", encoding="utf-8") as file:
+        json.dump({"processed_scripts": await count_scripts(processed_only=True)}, file)
 
-    return list_of_tokens
 
-
-def preprocess_script(
-    script: models.Script, english_words: Set[str]
-) -> Tuple[models.Script, List[str]]:
+async def load_corpus_vocabulary() -> Vocabulary:
     """
-    Preprocess a script.
+    Load the terms and their counts of the corpus.
+    They are counted again from the processed dialogues if they do not match the database.
     """
-    # Remove special characters and convert to lowercase
-    content = script.dialogue.lower()
-    content = re.sub("[–!\"#$%&'()*+,-./:;<=‘>—?@[\]^_`�{|}~\n’“”]", "", content)
-
-    # Remove non-english words
-    content = " ".join(
-        w
-        for w in nltk.wordpunct_tokenize(content)
-        if w.lower() in english_words or not w.isalpha()
-    )
-
-    # Tokenize the script
-    tokens = word_tokenize(content)
-
-    # Remove stopwords
-    stop_words = set(stopwords.words("english"))
-    tokens = [token for token in tokens if token not in stop_words]
-
-    # Lemmatize the tokens
-    lemmatizer = nltk.stem.WordNetLemmatizer()
-    tokens = [lemmatizer.lemmatize(token) for token in tokens]
-
-    # Create the processed script
-    processed_script = script
-    processed_script.processedDialogue = " ".join(tokens)
+    processed_scripts = None
+    if os.path.exists(preprocessing_state_file_path):
+        with open(preprocessing_state_file_path, "r", encoding="utf-8") as file:
+            processed_scripts = json.load(file)["processed_scripts"]
+
+    if processed_scripts == await count_scripts(processed_only=True):
+        corpus_vocabulary = Vocabulary.load(vocabulary_file_path)
+        if corpus_vocabulary is not None:
+            return corpus_vocabulary
+
+    # count the terms of all processed dialogues again
+    print("Term counts do not match the processed scripts, counting them again")
+    corpus_vocabulary = Vocabulary()
+    after_id = 0
+    while True:
+        processed_dialogues = await get_processed_dialogues(after_id, SCRIPT_PAGE_SIZE)
+        if not processed_dialogues:
+            break
+        after_id = processed_dialogues[-1][0]
+        corpus_vocabulary.add_tokens(
+            token
+            for _, processed_dialogue in processed_dialogues
+            for token in processed_dialogue.split()
+        )
 
-    return processed_script, tokens
+    await store_corpus_vocabulary(corpus_vocabulary)
+    return corpus_vocabulary
 
 
-def set_term_freq_map(term_freq_map: Dict[str, int], tokens: List[str]) -> None:
+def preprocess_query(query: str) -> List[str]:
     """
-    Set the term frequency map for a script.
+    Preprocess a search query the same way as the scripts.
     """
-    for token in tokens:
-        if token in term_freq_map:
-            term_freq_map[token] += 1
-        else:
-            term_freq_map[token] = 1
+    return preprocess_text(query)
@@ -0,0 +1,73 @@
+import re
+from functools import lru_cache
+from typing import List, Optional, Set, Tuple
+import nltk
+from nltk.corpus import stopwords
+from nltk.tokenize import NLTKWordTokenizer
+from utils.resource_manager import add_nltk_data_path
+from config import LEMMA_CACHE_SIZE
+
+# resources of this process, loaded once by init_text_preprocessing
+english_words: Optional[Set[str]] = None
+stop_words: Optional[Set[str]] = None
+lemmatizer: Optional[nltk.stem.WordNetLemmatizer] = None
+word_tokenizer = NLTKWordTokenizer()
+
+special_characters = re.compile("[–!\"#$%&'()*+,-./:;<=‘>—?@[\]^_`�{|}~\n’“”]")
+
+
+def init_text_preprocessing() -> None:
+    """
+    Load the word lists and the lemmatizer of this process.
+    Used as initializer of the preprocessing workers.
+    """
+    global english_words, stop_words, lemmatizer
+    if english_words is None:
+        add_nltk_data_path()
+        english_words = set(nltk.corpus.words.words())
+        stop_words = set(stopwords.words("english"))
+        lemmatizer = nltk.stem.WordNetLemmatizer()
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(token: str) -> str:
+    """
+    Lemmatize a token, the lemmas of the most recent distinct tokens are cached per process.
+    The cache is bounded, because the queries of the API also pass through it.
+    """
+    return lemmatizer.lemmatize(token)
+
+
+def preprocess_text(text: str) -> List[str]:
+    """
+    Preprocess a text and return its tokens.
+    """
+    init_text_preprocessing()
+
+    # Remove special characters and convert to lowercase
+    content = special_characters.sub("", text.lower())
+
+    # Remove non-english words
+    content = " ".join(
+        w
+        for w in nltk.wordpunct_tokenize(content)
+        if w in english_words or not w.isalpha()
+    )
+
+    # Tokenize the text, the punctuation is removed so it is a single sentence
+    tokens = word_tokenizer.tokenize(content)
+
+    # Remove stopwords and lemmatize the tokens
+    return [lemmatize(token) for token in tokens if token not in stop_words]
+
+
+def preprocess_dialogues(
+    dialogues: List[Tuple[int, str]]
+) -> List[Tuple[int, List[str]]]:
+    """
+    Preprocess a chunk of dialogues in a worker process.
+
+    :param dialogues: List of (script id, dialogue)
+    :return: List of (script id, tokens)
+    """
+    return [(script_id, preprocess_text(dialogue)) for script_id, dialogue in dialogues]
@@ -1,6 +1,8 @@
+import json
 from datetime import datetime
-from typing import Dict, List, Union
-from prisma import models, Prisma
+from typing import Dict, List, Tuple, Union
+from prisma import models
+from db.client import get_db
 
 
 async def get_all_actors() -> List[models.Actor]:
@@ -8,8 +10,8 @@ async def get_all_actors() -> List[models.Actor]:
     Fetch all actors from the database
     """
     try:
-        async with Prisma() as db:
-            return await db.actor.find_many()
+        db = await get_db()
+        return await db.actor.find_many()
     except Exception as e:
         print(f"An error occurred while fetching actors: {e}")
         return []
@@ -20,9 +22,9 @@ async def create_many_actors(actors: List[Dict[str, Union[str, int, str]]]) -> i
     Create multiple actors in the database
     """
     try:
-        async with Prisma() as db:
-            result = await db.actor.create_many(data=actors)
-            return result
+        db = await get_db()
+        result = await db.actor.create_many(data=actors)
+        return result
     except Exception as e:
         print(f"An error occurred while creating the actors: {e}")
 
@@ -32,15 +34,15 @@ async def create_one_actor(name: str, imdb_id: int, headshot_url: str) -> models
     Create an actor in the database
     """
     try:
-        async with Prisma() as db:
-            actor = await db.actor.create(
-                data={
-                    "name": name,
-                    "imdbId": imdb_id,
-                    "headshotUrl": headshot_url,
-                }
-            )
-            return actor
+        db = await get_db()
+        actor = await db.actor.create(
+            data={
+                "name": name,
+                "imdbId": imdb_id,
+                "headshotUrl": headshot_url,
+            }
+        )
+        return actor
     except Exception as e:
         print(f"An error occurred while creating the actor: {e}")
 
@@ -53,11 +55,11 @@ async def get_actors_by_ids(ids: List[int]) -> List[models.Actor]:
     :param ids: List of actor IDs
     """
     try:
-        async with Prisma() as db:
-            return await db.actor.find_many(
-                where={"id": {"in": ids}},
-                include={"roles": {"include": {"movie": True}}},
-            )
+        db = await get_db()
+        return await db.actor.find_many(
+            where={"id": {"in": ids}},
+            include={"roles": {"include": {"movie": True}}},
+        )
     except Exception as e:
         print(f"An error occurred while fetching actors: {e}")
         return []
@@ -69,10 +71,10 @@ async def delete_all_actors() -> None:
     """
     print("Deleting all actors")
     try:
-        async with Prisma() as db:
-            # await db.actor.delete_many()
-            # await db.execute_raw('TRUNCATE TABLE "Actor" RESTART IDENTITY')
-            await db.execute_raw('TRUNCATE TABLE "Actor" RESTART IDENTITY CASCADE')
+        db = await get_db()
+        # await db.actor.delete_many()
+        # await db.execute_raw('TRUNCATE TABLE "Actor" RESTART IDENTITY')
+        await db.execute_raw('TRUNCATE TABLE "Actor" RESTART IDENTITY CASCADE')
     except Exception as e:
         print(f"An error occurred while deleting actors: {e}")
 
@@ -82,9 +84,9 @@ async def get_actors_by_name(name: str) -> List[models.Actor]:
     Search for an actor in the database by name
     """
     try:
-        async with Prisma() as db:
-            actors = await db.actor.find_many(where={"name": {"contains": name}})
-            return actors
+        db = await get_db()
+        actors = await db.actor.find_many(where={"name": {"contains": name}})
+        return actors
     except Exception as e:
         print(f"An error occurred while searching for the actor: {e}")
         return []
@@ -95,19 +97,93 @@ async def get_actors_by_names(names: List[str]) -> List[models.Actor]:
     Search for actors by a list of names
     """
     try:
-        async with Prisma() as db:
-            actors = []
-            for name in names:
-                actor = await db.actor.find_first(
-                    where={"name": {"contains": name.lower(), "mode": "insensitive"}}
-                )
-                if actor is not None:
-                    actors.append(actor)
-
-            return actors
+        db = await get_db()
+        actor_ids = await get_actor_ids_by_names(names)
+        actors = await db.actor.find_many(
+            where={"id": {"in": list(set(actor_ids.values()))}}
+        )
+        actors_by_id = {actor.id: actor for actor in actors}
+
+        # keep the order of the names
+        return [
+            actors_by_id[actor_ids[name]]
+            for name in names
+            if name in actor_ids and actor_ids[name] in actors_by_id
+        ]
     except Exception as e:
         print(f"An error occurred while searching for the actors: {e}")
-        return {}
+        return []
+
+
+async def get_actor_ids_by_names(
+    names: List[str], chunk_size: int = 1000
+) -> Dict[str, int]:
+    """
+    Resolve a list of names to actor ids with set-based queries.
+    A name is matched exactly (case-insensitive) first, names without an exact match
+    fall back to the first actor whose name contains it.
+
+    :return: name -> actor id, names without a match are missing
+    """
+    unique_names = list(dict.fromkeys(name for name in names if name))
+    actor_ids = {}
+
+    try:
+        db = await get_db()
+        for i in range(0, len(unique_names), chunk_size):
+            chunk_of_names = unique_names[i : i + chunk_size]
+
+            # exact, case-insensitive matches
+            rows = await db.query_raw(
+                """
+                SELECT DISTINCT ON (lower(a.name)) lower(a.name) AS name, a.id
+                FROM "Actor" a
+                WHERE lower(a.name) IN (SELECT lower(json_array_elements_text($1::json)))
+                ORDER BY lower(a.name), a.id
+                """,
+                json.dumps(chunk_of_names),
+            )
+            exact_ids = {row["name"]: row["id"] for row in rows}
+            for name in chunk_of_names:
+                if name.lower() in exact_ids:
+                    actor_ids[name] = exact_ids[name.lower()]
+
+            # fuzzy matches for the remaining names
+            remaining_names = [name for name in chunk_of_names if name not in actor_ids]
+            if not remaining_names:
+                continue
+            rows = await db.query_raw(
+                """
+                SELECT n.name, a.id
+                FROM json_to_recordset($1::json) AS n(name text, pattern text)
+                CROSS JOIN LATERAL (
+                    SELECT id FROM "Actor"
+                    WHERE "Actor".name ILIKE '%' || n.pattern || '%'
+                    ORDER BY id
+                    LIMIT 1
+                ) a
+                """,
+                json.dumps(
+                    [
+                        {"name": name, "pattern": escape_like_pattern(name)}
+                        for name in remaining_names
+                    ]
+                ),
+            )
+            for row in rows:
+                actor_ids[row["name"]] = row["id"]
+
+        return actor_ids
+    except Exception as e:
+        print(f"An error occurred while resolving the actor names: {e}")
+        return actor_ids
+
+
+def escape_like_pattern(text: str) -> str:
+    """
+    Escape the LIKE wildcards in a text
+    """
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
 
 async def get_all_actors_dialogues() -> List[models.Actor]:
@@ -115,50 +191,98 @@ async def get_all_actors_dialogues() -> List[models.Actor]:
     Fetch all actors from the database with their concatenated dialogues.
     """
     try:
-        async with Prisma() as db:
-            # Fetch actors with their dialogues
-            actors_with_scripts = await db.actor.find_many(
-                where={"roles": {"some": {"scripts": {"some": {}}}}},
-                include={
-                    "roles": {
-                        "include": {
-                            "scripts": {
-                                "where": {"dialogue": {"not": ""}},
-                            }
+        db = await get_db()
+        # Fetch actors with their dialogues
+        actors_with_scripts = await db.actor.find_many(
+            where={"roles": {"some": {"scripts": {"some": {}}}}},
+            include={
+                "roles": {
+                    "include": {
+                        "scripts": {
+                            "where": {"dialogue": {"not": ""}},
                         }
                     }
-                },
-                order={"id": "asc"},
-            )
+                }
+            },
+            order={"id": "asc"},
+        )
 
-            return actors_with_scripts
+        return actors_with_scripts
     except Exception as e:
         print(f"An error occurred while fetching actors: {e}")
         return []
 
 
+async def get_unclassified_actors_dialogues(
+    after_id: int, take: int
+) -> List[models.Actor]:
+    """
+    Fetch the next page of actors with dialogues but without a classifier, ordered by id
+    """
+    try:
+        db = await get_db()
+        return await db.actor.find_many(
+            where={
+                "id": {"gt": after_id},
+                "roles": {"some": {"scripts": {"some": {}}}},
+                "classifiers": {"none": {}},
+            },
+            include={
+                "roles": {
+                    "include": {
+                        "scripts": {
+                            "where": {"dialogue": {"not": ""}},
+                        }
+                    }
+                }
+            },
+            order={"id": "asc"},
+            take=take,
+        )
+    except Exception as e:
+        print(f"An error occurred while fetching unclassified actors: {e}")
+        return []
+
+
+async def count_unclassified_actors() -> int:
+    """
+    Count the actors with dialogues but without a classifier
+    """
+    try:
+        db = await get_db()
+        return await db.actor.count(
+            where={
+                "roles": {"some": {"scripts": {"some": {}}}},
+                "classifiers": {"none": {}},
+            }
+        )
+    except Exception as e:
+        print(f"An error occurred while counting unclassified actors: {e}")
+        return -1
+
+
 async def get_all_actors_dialogues_processed() -> List[models.Actor]:
     """
     Fetch all actors from the database with their concatenated dialogues.
     """
     try:
-        async with Prisma() as db:
-            # Fetch actors with their dialogues
-            actors_with_scripts = await db.actor.find_many(
-                where={"roles": {"some": {"scripts": {"some": {}}}}},
-                include={
-                    "roles": {
-                        "include": {
-                            "scripts": {
-                                "where": {"processedDialogue": {"not": ""}},
-                            }
+        db = await get_db()
+        # Fetch actors with their dialogues
+        actors_with_scripts = await db.actor.find_many(
+            where={"roles": {"some": {"scripts": {"some": {}}}}},
+            include={
+                "roles": {
+                    "include": {
+                        "scripts": {
+                            "where": {"processedDialogue": {"not": ""}},
                         }
                     }
-                },
-                order={"id": "asc"},
-            )
+                }
+            },
+            order={"id": "asc"},
+        )
 
-            return actors_with_scripts
+        return actors_with_scripts
     except Exception as e:
         print(f"An error occurred while fetching actors: {e}")
         return []
@@ -169,14 +293,40 @@ async def get_actors_by_most_roles() -> List[models.Actor]:
     Fetch all actors from the database sorted by the number of roles they have.
     """
     try:
-        async with Prisma() as db:
-            # Fetch actors with their roles
-            actors_with_roles = await db.actor.find_many(include={"roles": True})
-            actors_with_roles = sorted(
-                actors_with_roles, key=lambda actor: len(actor.roles), reverse=True
-            )
+        db = await get_db()
+        # Fetch actors with their roles
+        actors_with_roles = await db.actor.find_many(include={"roles": True})
+        actors_with_roles = sorted(
+            actors_with_roles, key=lambda actor: len(actor.roles), reverse=True
+        )
 
-            return actors_with_roles
+        return actors_with_roles
     except Exception as e:
         print(f"An error occurred while fetching actors: {e}")
         return []
+
+
+async def get_classified_actor_ranks_by_most_roles() -> List[Tuple[int, int]]:
+    """
+    Rank all classified actors by the number of roles they have, counted in the database.
+    Actors with the same number of roles are ranked by their id.
+
+    :return: (actor id, rank) ordered by rank, starting with 0
+    """
+    try:
+        db = await get_db()
+        rows = await db.query_raw(
+            """
+            SELECT
+                c."actorId" AS id,
+                (ROW_NUMBER() OVER (ORDER BY COUNT(r.id) DESC, c."actorId" ASC) - 1)::int AS rank
+            FROM (SELECT DISTINCT "actorId" FROM "ActorClassifier") c
+            LEFT JOIN "Role" r ON r."actorId" = c."actorId"
+            GROUP BY c."actorId"
+            ORDER BY rank
+            """
+        )
+        return [(row["id"], row["rank"]) for row in rows]
+    except Exception as e:
+        print(f"An error occurred while ranking actors: {e}")
+        return []
@@ -1,20 +1,33 @@
 from datetime import datetime
 from typing import Dict, List, Union
-from prisma import models, Prisma
+from prisma import models
+from db.client import get_db
 
 
 async def get_all_actor_classifiers() -> List[models.ActorClassifier]:
     """
-    Fetch all actor classifiers from the database
+    Fetch all actor classifiers from the database, the oldest first
     """
     try:
-        async with Prisma() as db:
-            return await db.actorclassifier.find_many()
+        db = await get_db()
+        return await db.actorclassifier.find_many(order={"id": "asc"})
     except Exception as e:
         print(f"An error occurred while fetching actor classifiers: {e}")
         return []
 
 
+async def count_actor_classifiers() -> int:
+    """
+    Count the actor classifiers in the database
+    """
+    try:
+        db = await get_db()
+        return await db.actorclassifier.count()
+    except Exception as e:
+        print(f"An error occurred while counting actor classifiers: {e}")
+        return -1
+
+
 async def create_many_actor_classifiers(
     actor_classifiers: List[Dict[str, Union[int, float]]]
 ) -> int:
@@ -22,9 +35,9 @@ async def create_many_actor_classifiers(
     Create multiple actor classifiers in the database
     """
     try:
-        async with Prisma() as db:
-            result = await db.actorclassifier.create_many(data=actor_classifiers)
-            return result
+        db = await get_db()
+        result = await db.actorclassifier.create_many(data=actor_classifiers)
+        return result
     except Exception as e:
         print(f"An error occurred while creating the actor classifiers: {e}")
 
@@ -42,19 +55,19 @@ async def create_one_actor_classifier(
     Create an actor classifier in the database
     """
     try:
-        async with Prisma() as db:
-            actor_classifier = await db.actorclassifier.create(
-                data={
-                    "actorId": actor_id,
-                    "loveScore": love_score,
-                    "joyScore": joy_score,
-                    "angerScore": anger_score,
-                    "sadnessScore": sadness_score,
-                    "surpriseScore": surprise_score,
-                    "fearScore": fear_score,
-                }
-            )
-            return actor_classifier
+        db = await get_db()
+        actor_classifier = await db.actorclassifier.create(
+            data={
+                "actorId": actor_id,
+                "loveScore": love_score,
+                "joyScore": joy_score,
+                "angerScore": anger_score,
+                "sadnessScore": sadness_score,
+                "surpriseScore": surprise_score,
+                "fearScore": fear_score,
+            }
+        )
+        return actor_classifier
     except Exception as e:
         print(f"An error occurred while creating the actor classifier: {e}")
 
@@ -65,10 +78,10 @@ async def delete_all_actor_classifiers() -> None:
     """
     print("Deleting all actor classifiers")
     try:
-        async with Prisma() as db:
-            await db.execute_raw(
-                'TRUNCATE TABLE "ActorClassifier" RESTART IDENTITY CASCADE'
-            )
+        db = await get_db()
+        await db.execute_raw(
+            'TRUNCATE TABLE "ActorClassifier" RESTART IDENTITY CASCADE'
+        )
     except Exception as e:
         print(f"An error occurred while deleting actor classifiers: {e}")
 
@@ -78,8 +91,8 @@ async def search_actor_classifier(actor_id: int) -> List[models.ActorClassifier]
     Search for an actor classifier by actor id
     """
     try:
-        async with Prisma() as db:
-            return await db.actorclassifier.find_many(where={"actorId": actor_id})
+        db = await get_db()
+        return await db.actorclassifier.find_many(where={"actorId": actor_id})
     except Exception as e:
         print(f"An error occurred while searching for the actor classifier: {e}")
         return []
@@ -90,14 +103,14 @@ async def search_actor_classifiers(actor_ids: List[int]) -> Dict[int, int]:
     Search for actor classifiers by actor ids
     """
     try:
-        async with Prisma() as db:
-            actor_classifiers = await db.actorclassifier.find_many(
-                where={"actorId": {"in": actor_ids}}
-            )
-            return {
-                actor_classifier.actorId: actor_classifier.id
-                for actor_classifier in actor_classifiers
-            }
+        db = await get_db()
+        actor_classifiers = await db.actorclassifier.find_many(
+            where={"actorId": {"in": actor_ids}}
+        )
+        return {
+            actor_classifier.actorId: actor_classifier.id
+            for actor_classifier in actor_classifiers
+        }
     except Exception as e:
         print(f"An error occurred while searching for the actor classifiers: {e}")
         return {}
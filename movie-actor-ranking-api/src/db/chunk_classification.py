@@ -0,0 +1,40 @@
+from typing import Dict, List
+from db.client import get_db
+
+LOOKUP_CHUNK_SIZE = 1000
+
+
+async def get_chunk_scores(hashes: List[str]) -> Dict[str, List[float]]:
+    """
+    Fetch the cached scores of chunks by their content hashes, hashes without scores are missing in the result
+    """
+    chunk_scores = {}
+    try:
+        db = await get_db()
+        for i in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+            chunk_classifications = await db.chunkclassification.find_many(
+                where={"hash": {"in": hashes[i : i + LOOKUP_CHUNK_SIZE]}}
+            )
+            for chunk_classification in chunk_classifications:
+                chunk_scores[chunk_classification.hash] = chunk_classification.scores
+    except Exception as e:
+        print(f"An error occurred while fetching chunk scores: {e}")
+    return chunk_scores
+
+
+async def create_many_chunk_scores(chunk_scores: Dict[str, List[float]]) -> int:
+    """
+    Store the scores of chunks by their content hashes, hashes that are already stored are skipped
+    """
+    try:
+        db = await get_db()
+        return await db.chunkclassification.create_many(
+            data=[
+                {"hash": chunk_hash, "scores": scores}
+                for chunk_hash, scores in chunk_scores.items()
+            ],
+            skip_duplicates=True,
+        )
+    except Exception as e:
+        print(f"An error occurred while creating the chunk scores: {e}")
+        return 0
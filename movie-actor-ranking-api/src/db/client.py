@@ -0,0 +1,69 @@
+import asyncio
+from datetime import timedelta
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from prisma import Prisma
+from config import (
+    DATABASE_URL,
+    DATABASE_CONNECTION_LIMIT,
+    DATABASE_POOL_TIMEOUT,
+    DATABASE_CONNECT_TIMEOUT,
+    DATABASE_QUERY_TIMEOUT,
+)
+
+# one connected client per worker, shared by all db helpers
+client: Optional[Prisma] = None
+connect_lock = asyncio.Lock()
+
+
+def get_datasource_url() -> Optional[str]:
+    """
+    Add the connection pool settings to the database url
+    """
+    if not DATABASE_URL:
+        return None
+    url = urlsplit(DATABASE_URL)
+    query = dict(parse_qsl(url.query))
+    query.setdefault("connection_limit", str(DATABASE_CONNECTION_LIMIT))
+    query.setdefault("pool_timeout", str(DATABASE_POOL_TIMEOUT))
+    query.setdefault("connect_timeout", str(DATABASE_CONNECT_TIMEOUT))
+    return urlunsplit(url._replace(query=urlencode(query)))
+
+
+async def connect_db() -> Prisma:
+    """
+    Connect the shared database client
+    """
+    global client
+    # concurrent requests must not connect twice
+    async with connect_lock:
+        if client is None:
+            datasource_url = get_datasource_url()
+            client = Prisma(
+                datasource={"url": datasource_url} if datasource_url else None,
+                connect_timeout=timedelta(seconds=DATABASE_CONNECT_TIMEOUT),
+                http={"timeout": DATABASE_QUERY_TIMEOUT},
+            )
+        if not client.is_connected():
+            await client.connect()
+            print(f"Connected to the database, pool size {DATABASE_CONNECTION_LIMIT}")
+    return client
+
+
+async def disconnect_db() -> None:
+    """
+    Disconnect the shared database client
+    """
+    global client
+    if client is not None and client.is_connected():
+        await client.disconnect()
+    client = None
+
+
+async def get_db() -> Prisma:
+    """
+    Get the shared database client, it is connected on first use
+    """
+    if client is not None and client.is_connected():
+        return client
+    return await connect_db()
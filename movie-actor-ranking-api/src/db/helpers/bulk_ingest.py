@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import asyncio
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import pandas as pd
+import psycopg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from config import (
+    DATABASE_URL,
+    PRO_IMDB_MOV_ROL_FILE_PATH,
+    PRO_IMDB_IMSDB_MOV_SCR_FILE_PATH,
+)
+
+
+async def bulk_ingest():
+    """
+    Reload the database with COPY: every file is read once, the keys are assigned in memory
+    through the imdb ids and every table is streamed into postgres.
+    The truncate and all copies run in one transaction, so a failed reload keeps the previous data.
+    """
+    # columns: imdb_movie_title,imdb_movie_id,imdb_movie_cover_url,imdb_actor_name,imdb_actor_id,role,imdb_actor_headshot_url
+    movie_roles = pd.read_csv(PRO_IMDB_MOV_ROL_FILE_PATH)
+    # columns: title,imdb_movie_id,actor,imdb_actor_id,role,dialogueText
+    movie_scripts = pd.read_csv(PRO_IMDB_IMSDB_MOV_SCR_FILE_PATH)
+
+    actors, actor_ids = prepare_actors(movie_roles)
+    movies, movie_ids = prepare_movies(movie_roles)
+    roles, role_ids = prepare_roles(movie_roles, movie_ids, actor_ids)
+    scripts = prepare_scripts(movie_scripts, movie_ids, role_ids)
+
+    async with await psycopg.AsyncConnection.connect(get_connection_url()) as conn:
+        async with conn.transaction():
+            await conn.execute(
+                'TRUNCATE TABLE "Script", "Role", "Actor", "Movie", "ActorClassifier" RESTART IDENTITY CASCADE'
+            )
+
+            await copy_table(conn, "Actor", ["id", "name", "imdbId", "headshotUrl"], actors)
+            await copy_table(conn, "Movie", ["id", "title", "imdbId", "coverUrl"], movies)
+            await copy_table(conn, "Role", ["id", "name", "movieId", "actorId"], roles)
+            await copy_table(conn, "Script", ["movieId", "roleId", "dialogue"], scripts)
+
+
+async def copy_table(
+    conn: psycopg.AsyncConnection, table: str, columns: List[str], rows: List[Tuple]
+) -> None:
+    """
+    Stream the rows into the table with COPY and move the id sequence behind the inserted ids.
+    Runs in the transaction of the caller.
+    """
+    start = time.perf_counter()
+    column_names = ", ".join(f'"{column}"' for column in columns)
+
+    async with conn.cursor() as cursor:
+        async with cursor.copy(f'COPY "{table}" ({column_names}) FROM STDIN') as copy:
+            for row in rows:
+                await copy.write_row(row)
+
+        # the ids were assigned in memory, continue the sequence after them
+        await cursor.execute(
+            f"""SELECT setval(pg_get_serial_sequence('"{table}"', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM "{table}" """
+        )
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Inserted {len(rows)} rows into {table} in {elapsed:.1f}s "
+        f"({len(rows) / elapsed if elapsed > 0 else 0:.0f} rows/s)"
+    )
+
+
+def prepare_actors(movie_roles: pd.DataFrame) -> Tuple[List[Tuple], Dict[int, int]]:
+    """
+    Get the actor rows and the imdb actor id -> actor id map
+    """
+    actors = movie_roles[
+        ["imdb_actor_id", "imdb_actor_name", "imdb_actor_headshot_url"]
+    ].dropna(subset=["imdb_actor_id"])
+    actors = actors.drop_duplicates(subset=["imdb_actor_id"])
+
+    rows = []
+    actor_ids = {}
+    for actor_id, (imdb_id, name, headshot_url) in enumerate(
+        actors.itertuples(index=False), start=1
+    ):
+        actor_ids[int(imdb_id)] = actor_id
+        rows.append((actor_id, name, int(imdb_id), to_optional_str(headshot_url)))
+    return rows, actor_ids
+
+
+def prepare_movies(movie_roles: pd.DataFrame) -> Tuple[List[Tuple], Dict[int, int]]:
+    """
+    Get the movie rows and the imdb movie id -> movie id map
+    """
+    movies = movie_roles[
+        ["imdb_movie_id", "imdb_movie_title", "imdb_movie_cover_url"]
+    ].dropna(subset=["imdb_movie_id"])
+    movies = movies.drop_duplicates(subset=["imdb_movie_id"])
+
+    rows = []
+    movie_ids = {}
+    for movie_id, (imdb_id, title, cover_url) in enumerate(
+        movies.itertuples(index=False), start=1
+    ):
+        movie_ids[int(imdb_id)] = movie_id
+        rows.append((movie_id, title, int(imdb_id), to_optional_str(cover_url)))
+    return rows, movie_ids
+
+
+def prepare_roles(
+    movie_roles: pd.DataFrame, movie_ids: Dict[int, int], actor_ids: Dict[int, int]
+) -> Tuple[List[Tuple], Dict[Tuple[int, int, str], int]]:
+    """
+    Get the role rows and the (imdb movie id, imdb actor id, role) -> role id map
+    """
+    roles = movie_roles[["imdb_movie_id", "imdb_actor_id", "role"]].dropna()
+    roles = roles.drop_duplicates()
+
+    rows = []
+    role_ids = {}
+    for imdb_movie_id, imdb_actor_id, name in roles.itertuples(index=False):
+        movie_id = movie_ids.get(int(imdb_movie_id))
+        actor_id = actor_ids.get(int(imdb_actor_id))
+        if movie_id is None or actor_id is None:
+            continue
+        role_id = len(rows) + 1
+        role_ids[(int(imdb_movie_id), int(imdb_actor_id), name)] = role_id
+        rows.append((role_id, name, movie_id, actor_id))
+    return rows, role_ids
+
+
+def prepare_scripts(
+    movie_scripts: pd.DataFrame,
+    movie_ids: Dict[int, int],
+    role_ids: Dict[Tuple[int, int, str], int],
+) -> List[Tuple]:
+    """
+    Get the script rows, scripts without a known movie or role are skipped
+    """
+    scripts = movie_scripts[
+        ["imdb_movie_id", "imdb_actor_id", "role", "dialogueText"]
+    ].dropna()
+    scripts = scripts.drop_duplicates()
+
+    rows = []
+    for imdb_movie_id, imdb_actor_id, role, dialogue in scripts.itertuples(index=False):
+        movie_id = movie_ids.get(int(imdb_movie_id))
+        role_id = role_ids.get((int(imdb_movie_id), int(imdb_actor_id), role))
+        if movie_id is None or role_id is None:
+            continue
+        rows.append((movie_id, role_id, dialogue))
+    return rows
+
+
+def to_optional_str(value) -> str:
+    """
+    Convert missing values (nan) to None
+    """
+    return value if isinstance(value, str) else None
+
+
+def get_connection_url() -> str:
+    """
+    Get the database url without the prisma specific parameters
+    """
+    url = urlsplit(DATABASE_URL)
+    query = [
+        (key, value) for key, value in parse_qsl(url.query) if key != "schema"
+    ]
+    return urlunsplit(url._replace(query=urlencode(query)))
+
+
+if __name__ == "__main__":
+    asyncio.run(bulk_ingest())
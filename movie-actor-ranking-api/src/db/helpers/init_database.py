@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import os
 import sys
@@ -7,12 +8,13 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 from db.actor import (
     create_many_actors,
     delete_all_actors,
-    get_actors_by_names,
+    get_actor_ids_by_names,
 )
 from db.movie import create_many_movies, delete_all_movies, search_movie, search_movies
 from db.role import create_many_roles, delete_all_roles, search_roles
 from db.script import create_many_scripts, delete_all_scripts
 from db.helpers.reset_database import reset_database
+from db.helpers.bulk_ingest import bulk_ingest
 from config import (
     PRO_IMDB_MOV_ROL_FILE_PATH,
     PRO_IMDB_IMSDB_MOV_SCR_FILE_PATH,
@@ -100,12 +102,9 @@ async def insert_roles():
     movie_ids = await search_movies(list(roles["imdb_movie_title"].unique()))
     roles["db_movie_id"] = roles["imdb_movie_title"].map(movie_ids)
 
-    actors = await get_actors_by_names(list(roles["imdb_actor_name"].unique()))
-
-    # add database actorId with search_actor function
-    roles["db_actor_id"] = roles["imdb_actor_name"].map(
-        {actor.name: actor.id for actor in actors}
-    )
+    # add database actorId, all names are resolved in a few bulk queries
+    actor_ids = await get_actor_ids_by_names(list(roles["imdb_actor_name"].unique()))
+    roles["db_actor_id"] = roles["imdb_actor_name"].map(actor_ids)
 
     # select only the columns we need
     roles = roles[["role", "db_movie_id", "db_actor_id"]]
@@ -159,4 +158,15 @@ async def insert_scripts():
 
 
 if __name__ == "__main__":
-    asyncio.run(init_database())
+    parser = argparse.ArgumentParser(description="Initialize the database")
+    parser.add_argument(
+        "--copy",
+        action="store_true",
+        help="bulk ingest the files with COPY instead of inserting them through prisma",
+    )
+    args = parser.parse_args()
+
+    if args.copy:
+        asyncio.run(bulk_ingest())
+    else:
+        asyncio.run(init_database())
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Dict, List, Union
-from prisma import models, Prisma
+from prisma import models
+from db.client import get_db
 
 
 async def get_all_roles() -> List[models.Role]:
@@ -8,21 +9,33 @@ async def get_all_roles() -> List[models.Role]:
     Fetch all roles from the database
     """
     try:
-        async with Prisma() as db:
-            return await db.role.find_many()
+        db = await get_db()
+        return await db.role.find_many()
     except Exception as e:
         print(f"An error occurred while fetching roles: {e}")
         return []
 
 
+async def count_roles() -> int:
+    """
+    Count the roles in the database
+    """
+    try:
+        db = await get_db()
+        return await db.role.count()
+    except Exception as e:
+        print(f"An error occurred while counting roles: {e}")
+        return -1
+
+
 async def create_many_roles(roles: List[Dict[str, Union[str, int]]]) -> int:
     """
     Create multiple roles in the database
     """
     try:
-        async with Prisma() as db:
-            result = await db.role.create_many(data=roles)
-            return result
+        db = await get_db()
+        result = await db.role.create_many(data=roles)
+        return result
     except Exception as e:
         print(f"An error occurred while creating the roles: {e}")
 
@@ -32,15 +45,15 @@ async def create_one_role(name: str, movie_id: int, actor_id: int) -> models.Rol
     Create a role in the database
     """
     try:
-        async with Prisma() as db:
-            role = await db.role.create(
-                data={
-                    "name": name,
-                    "movieId": movie_id,
-                    "actorId": actor_id,
-                }
-            )
-            return role
+        db = await get_db()
+        role = await db.role.create(
+            data={
+                "name": name,
+                "movieId": movie_id,
+                "actorId": actor_id,
+            }
+        )
+        return role
     except Exception as e:
         print(f"An error occurred while creating the role: {e}")
 
@@ -51,10 +64,10 @@ async def delete_all_roles() -> None:
     """
     print("Deleting all roles")
     try:
-        async with Prisma() as db:
-            # await db.role.delete_many()
-            # await db.execute_raw('TRUNCATE TABLE "Role" RESTART IDENTITY')
-            await db.execute_raw('TRUNCATE TABLE "Role" RESTART IDENTITY CASCADE')
+        db = await get_db()
+        # await db.role.delete_many()
+        # await db.execute_raw('TRUNCATE TABLE "Role" RESTART IDENTITY')
+        await db.execute_raw('TRUNCATE TABLE "Role" RESTART IDENTITY CASCADE')
     except Exception as e:
         print(f"An error occurred while deleting roles: {e}")
 
@@ -64,8 +77,8 @@ async def search_role(title: str) -> List[models.Role]:
     Search for a role by title
     """
     try:
-        async with Prisma() as db:
-            return await db.role.find_many(where={"name": {"contains": title}})
+        db = await get_db()
+        return await db.role.find_many(where={"name": {"contains": title}})
     except Exception as e:
         print(f"An error occurred while searching for a role: {e}")
         return []
@@ -76,9 +89,9 @@ async def search_roles(titles: List[str]) -> Dict[str, int]:
     Search for roles by titles
     """
     try:
-        async with Prisma() as db:
-            roles = await db.role.find_many(where={"name": {"in": titles}})
-            return {role.name: role.id for role in roles}
+        db = await get_db()
+        roles = await db.role.find_many(where={"name": {"in": titles}})
+        return {role.name: role.id for role in roles}
     except Exception as e:
         print(f"An error occurred while searching for roles: {e}")
         return {}
@@ -1,6 +1,9 @@
+import json
 from datetime import datetime
-from typing import Dict, List, Union
-from prisma import models, Prisma
+from typing import Dict, List, Tuple, Union
+from prisma import models
+from db.client import get_db
+from config import SCRIPT_UPDATE_BATCH_SIZE
 
 
 async def get_all_scripts() -> List[models.Script]:
@@ -8,21 +11,76 @@ async def get_all_scripts() -> List[models.Script]:
     Fetch all scripts from the database
     """
     try:
-        async with Prisma() as db:
-            return await db.script.find_many()
+        db = await get_db()
+        return await db.script.find_many()
     except Exception as e:
         print(f"An error occurred while fetching scripts: {e}")
         return []
 
 
+async def get_unprocessed_scripts(after_id: int, take: int) -> List[models.Script]:
+    """
+    Fetch the next page of scripts without a processed dialogue, ordered by id
+    """
+    try:
+        db = await get_db()
+        return await db.script.find_many(
+            where={"processedDialogue": None, "id": {"gt": after_id}},
+            order={"id": "asc"},
+            take=take,
+        )
+    except Exception as e:
+        print(f"An error occurred while fetching unprocessed scripts: {e}")
+        return []
+
+
+async def get_processed_dialogues(after_id: int, take: int) -> List[Tuple[int, str]]:
+    """
+    Fetch the next page of processed dialogues as (script id, processed dialogue), ordered by id
+    """
+    try:
+        db = await get_db()
+        rows = await db.query_raw(
+            """
+            SELECT id, "processedDialogue"
+            FROM "Script"
+            WHERE "processedDialogue" IS NOT NULL AND id > $1
+            ORDER BY id
+            LIMIT $2
+            """,
+            after_id,
+            take,
+        )
+        return [(row["id"], row["processedDialogue"]) for row in rows]
+    except Exception as e:
+        print(f"An error occurred while fetching processed dialogues: {e}")
+        return []
+
+
+async def count_scripts(processed_only: bool = False) -> int:
+    """
+    Count the scripts in the database, optionally only the preprocessed ones
+    """
+    try:
+        db = await get_db()
+        if processed_only:
+            return await db.script.count(
+                where={"processedDialogue": {"not": None}}
+            )
+        return await db.script.count()
+    except Exception as e:
+        print(f"An error occurred while counting scripts: {e}")
+        return -1
+
+
 async def create_many_scripts(scripts: List[Dict[str, Union[str, int]]]) -> int:
     """
     Create multiple scripts in the database
     """
     try:
-        async with Prisma() as db:
-            result = await db.script.create_many(data=scripts)
-            return result
+        db = await get_db()
+        result = await db.script.create_many(data=scripts)
+        return result
     except Exception as e:
         print(f"An error occurred while creating the scripts: {e}")
 
@@ -34,59 +92,54 @@ async def create_one_script(
     Create a script in the database
     """
     try:
-        async with Prisma() as db:
-            script = await db.script.create(
-                data={
-                    "dialogue": dialogue,
-                    "movieId": movie_id,
-                    "roleId": role_id,
-                }
-            )
-            return script
+        db = await get_db()
+        script = await db.script.create(
+            data={
+                "dialogue": dialogue,
+                "movieId": movie_id,
+                "roleId": role_id,
+            }
+        )
+        return script
     except Exception as e:
         print(f"An error occurred while creating the script: {e}")
 
 
-async def update_scripts(scripts: List[models.Script]) -> None:
-    """
-    Update a List of scripts in the database
+async def update_processed_dialogues(
+    processed_dialogues: List[Tuple[int, str]],
+    batch_size: int = SCRIPT_UPDATE_BATCH_SIZE,
+) -> int:
     """
-    list_of_ids = [script.id for script in scripts]
-    list_of_scripts = []
-
-    for script in scripts:
-        list_of_scripts.append(
-            {
-                "id": script.id,
-                "dialogue": script.dialogue,
-                "movieId": script.movieId,
-                "roleId": script.roleId,
-                "processedDialogue": script.processedDialogue,
-            }
-        )
+    Write the processed dialogues of scripts to the database, the other columns are left untouched.
+    Every batch is a single UPDATE statement, so it is committed on its own and an
+    interrupted run keeps the batches written so far.
 
+    :param processed_dialogues: List of (script id, processed dialogue)
+    :return: number of updated scripts
+    """
+    updated = 0
     try:
-        async with Prisma() as db:
-            # Split list_of_ids into chunks of 32767, because SQL cant handle more
-            for i in range(0, len(list_of_ids), 32767):
-                chunk_of_ids = list_of_ids[i : i + 32767]
-
-                await db.script.delete_many(  # delete all scripts with the given ids
-                    where={"id": {"in": chunk_of_ids}}
-                )
-
-                list_of_scripts_with_id = [
-                    script for script in list_of_scripts if script["id"] in chunk_of_ids
-                ]
-
-                await db.script.create_many(  # reinsert the scripts
-                    data=list_of_scripts_with_id,
-                )
-            else:
-                print("No scripts to update.")
-
+        db = await get_db()
+        for i in range(0, len(processed_dialogues), batch_size):
+            batch = processed_dialogues[i : i + batch_size]
+            updated += await db.execute_raw(
+                """
+                UPDATE "Script" AS s
+                SET "processedDialogue" = v."processedDialogue"
+                FROM json_to_recordset($1::json) AS v(id int, "processedDialogue" text)
+                WHERE s.id = v.id
+                """,
+                json.dumps(
+                    [
+                        {"id": script_id, "processedDialogue": processed_dialogue}
+                        for script_id, processed_dialogue in batch
+                    ]
+                ),
+            )
+            print(f"Updated {updated}/{len(processed_dialogues)} processed dialogues")
     except Exception as e:
-        print(f"An error occurred while updating the scripts: {e}")
+        print(f"An error occurred while updating the processed dialogues: {e}")
+    return updated
 
 
 async def delete_all_scripts() -> None:
@@ -95,9 +148,9 @@ async def delete_all_scripts() -> None:
     """
     print("Deleting all scripts")
     try:
-        async with Prisma() as db:
-            # await db.script.delete_many()
-            # await db.execute_raw('TRUNCATE TABLE "Script" RESTART IDENTITY')
-            await db.execute_raw('TRUNCATE TABLE "Script" RESTART IDENTITY CASCADE')
+        db = await get_db()
+        # await db.script.delete_many()
+        # await db.execute_raw('TRUNCATE TABLE "Script" RESTART IDENTITY')
+        await db.execute_raw('TRUNCATE TABLE "Script" RESTART IDENTITY CASCADE')
     except Exception as e:
         print(f"An error occurred while deleting scripts: {e}")
@@ -18,7 +18,7 @@ from config import (
     EVAL_MEASURES_IMAGE_PATH,
     EVAL_MEASURES_CSV_PATH,
 )
-from db.actor import get_actors_by_names
+from db.actor import get_actor_ids_by_names
 
 
 base_url = "http://127.0.0.1:8000"
@@ -91,11 +91,11 @@ async def get_relevant_actors(query: str, ground_truth_df: pd.DataFrame) -> List
     # filter the by column name, but keep the rank
     df_query = ground_truth_df[query]
 
-    # map name to each db actor
-    db_actors = await get_actors_by_names(df_query.values.tolist())
+    # map name to each db actor id
+    actor_ids = await get_actor_ids_by_names(df_query.values.tolist())
 
     # get list of ids
-    relevant_docs = [actor.id for actor in db_actors]
+    relevant_docs = list(set(actor_ids.values()))
 
     # sort the list
     relevant_docs.sort()
@@ -145,13 +145,13 @@ async def calculate_differences():
 
         df_query = df[query]
 
-        # map name to each db actor
-        db_actors = await get_actors_by_names(df_query.values.tolist())
+        # map name to each db actor id
+        actor_ids = await get_actor_ids_by_names(df_query.values.tolist())
 
         # return the difference, which are not in the db
-        diff = set(df_query.values.tolist()) - set([actor.name for actor in db_actors])
+        diff = set(df_query.values.tolist()) - set(actor_ids.keys())
         print("original: ", len(df_query))
-        print("db: ", len(db_actors))
+        print("db: ", len(actor_ids))
         print(diff)
 
 
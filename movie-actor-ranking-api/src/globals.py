@@ -1,25 +1,52 @@
+from utils.vocabulary import Vocabulary
+
+
 def init_globals():
     """
     Initialize the global variables
     """
     global _vocabulary
-    global _document_frequency
+    global _corpus_vocabulary
     global _document_term_weight_matrix
-    global _document_id_vector_map
+    global _document_ids
+    global _postings_indptr
+    global _postings_rows
+    global _postings_tfs
+    global _inverse_document_frequency
+    global _document_norms
     global _U_reduced
     global _S_reduced
     global _V_reduced
+    global _query_projection
     global _document_svd_matrix
-    global _classifier
-    global _classified_actors_vector_map
+    global _classification_tokenizer
+    global _classification_config
+    global _classification_backend
+    global _inference_executor
+    global _classified_actor_ids
+    global _classified_actor_matrix
+    global _classified_actor_norms
+    global _fame_coefficients
 
-    _vocabulary = []  # List of str
-    _document_frequency = {}
-    _document_term_weight_matrix = []
-    _document_id_vector_map = {}
+    _vocabulary = Vocabulary()  # terms of the document term matrix, id -> column
+    _corpus_vocabulary = Vocabulary()  # all terms of the processed scripts with their counts
+    _document_term_weight_matrix = []  # scipy.sparse.csr_matrix, actors x terms
+    _document_ids = []  # row index of the document term matrix
+    _postings_indptr = []  # term id -> start of its postings list
+    _postings_rows = []  # document rows of the postings lists
+    _postings_tfs = []  # term frequencies of the postings lists
+    _inverse_document_frequency = []
+    _document_norms = []
     _U_reduced = []
     _S_reduced = []
     _V_reduced = []
-    _document_svd_matrix = {}
-    _classifier = None
-    _classified_actors_vector_map = {}
+    _query_projection = []  # U_k * S_k^-1
+    _document_svd_matrix = []  # normalized V_k, rows as _document_ids
+    _classification_tokenizer = None
+    _classification_config = None  # config of the model, labels and maximum length
+    _classification_backend = None  # runs the model of the classifier, see utils.inference_backend
+    _inference_executor = None  # ThreadPoolExecutor for the model inference
+    _classified_actor_ids = []  # row index of the actor matrix
+    _classified_actor_matrix = []
+    _classified_actor_norms = []
+    _fame_coefficients = []
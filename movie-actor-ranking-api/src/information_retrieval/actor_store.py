@@ -0,0 +1,45 @@
+from typing import List
+from prisma import models
+from tqdm import tqdm
+from db.actor import get_actors_by_ids
+from utils.lru_cache import LRUCache
+from config import ACTOR_STORE_MAX_SIZE, ACTOR_STORE_TTL
+
+# actor id -> actor with roles and movies
+actor_store = LRUCache(max_size=ACTOR_STORE_MAX_SIZE, ttl=ACTOR_STORE_TTL)
+
+PRELOAD_CHUNK_SIZE = 1000
+
+
+async def preload_actor_store(actor_ids: List[int]) -> None:
+    """
+    Load the complete data of the actors into the store
+    """
+    for i in tqdm(
+        range(0, len(actor_ids), PRELOAD_CHUNK_SIZE), desc="Preloading actor store"
+    ):
+        for actor in await get_actors_by_ids(actor_ids[i : i + PRELOAD_CHUNK_SIZE]):
+            actor_store.set(actor.id, actor)
+
+
+async def get_ranked_actors(actor_ids: List[int]) -> List[models.Actor]:
+    """
+    Get the actors with their complete data in the order of the given ids.
+    Only actors missing in the store are fetched from the database.
+    """
+    actors = {}
+    missing_actor_ids = []
+    for actor_id in actor_ids:
+        actor = actor_store.get(actor_id)
+        if actor is None:
+            missing_actor_ids.append(actor_id)
+        else:
+            actors[actor_id] = actor
+
+    if missing_actor_ids:
+        for actor in await get_actors_by_ids(missing_actor_ids):
+            actor_store.set(actor.id, actor)
+            actors[actor.id] = actor
+
+    # keep the ranking, actors that do not exist anymore are skipped
+    return [actors[actor_id] for actor_id in actor_ids if actor_id in actors]
@@ -0,0 +1,51 @@
+from typing import List
+import numpy as np
+import globals
+from config import FAME_COEFFICIENT_PERCENTAGE
+
+
+def build_actor_matrix(
+    actor_ids: List[int],
+    actor_vectors: List[List[float]],
+    fame_coefficients: List[float],
+) -> None:
+    """
+    Store all actor vectors in one contiguous float32 matrix together with the
+    precomputed row norms and the matching fame coefficients.
+    Row i of every array belongs to actor_ids[i].
+    """
+    # missing scores (None) become nan, treat them as 0
+    matrix = np.ascontiguousarray(
+        np.nan_to_num(np.asarray(actor_vectors, dtype=np.float32)), dtype=np.float32
+    )
+    if matrix.ndim != 2:  # no classified actors
+        matrix = np.zeros((0, 6), dtype=np.float32)
+
+    norms = np.linalg.norm(matrix, axis=1).astype(np.float32)
+
+    globals._classified_actor_ids = np.asarray(actor_ids, dtype=np.int64)
+    globals._classified_actor_matrix = matrix
+    globals._classified_actor_norms = norms
+    globals._fame_coefficients = np.asarray(fame_coefficients, dtype=np.float32)
+
+
+def score_actor_matrix(query_vector: List[float]) -> np.ndarray:
+    """
+    Score every actor against the query vector with a single matrix-vector product.
+    The cosine similarity and the fame coefficient are blended in the same pass:
+    score = cos(q, a) * (1 - p) + fame * p
+    """
+    query = np.asarray(query_vector, dtype=np.float32)
+    magnitude_query = np.linalg.norm(query)
+
+    scores = globals._classified_actor_matrix @ query
+
+    # cosine similarity, actors or queries without any score get a similarity of 0
+    denominator = globals._classified_actor_norms * magnitude_query
+    np.divide(scores, denominator, out=scores, where=denominator > 0)
+    scores[denominator <= 0] = 0
+
+    # fused fame blend
+    scores *= 1 - FAME_COEFFICIENT_PERCENTAGE
+    scores += globals._fame_coefficients * FAME_COEFFICIENT_PERCENTAGE
+    return scores
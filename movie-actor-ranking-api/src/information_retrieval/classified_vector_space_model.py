@@ -1,63 +1,54 @@
 import math
 from typing import Any, List, Dict
-import numpy as np
-from db.actor import (
-    get_actors_by_ids,
-)
+from information_retrieval.actor_store import get_ranked_actors
 import globals
 from tqdm import tqdm
 from concurrent.futures import ProcessPoolExecutor
 from prisma import models
 from db.actor_classifier import get_all_actor_classifiers
-from db.actor import get_actors_by_most_roles
+from db.actor import get_classified_actor_ranks_by_most_roles
 from nltk.corpus import wordnet as wn
 from db.actor_classifier import get_all_actor_classifiers
-from utils.classification import get_classification
-from config import FAME_COEFFICIENT_PERCENTAGE
-from db.actor_classifier import get_all_actor_classifiers
-
-fame_coefficient_map = {}
+from utils.micro_batcher import get_batched_classification
+from utils.query_cache import get_cached_query_vector, cache_query_vector
+from information_retrieval.classified_scoring_engine import (
+    build_actor_matrix,
+    score_actor_matrix,
+)
+from information_retrieval.ranking import top_k
+from config import SEARCH_TOP_K
 
 
-async def search_classified_vector_space_model(query: List[str]) -> List[int]:
+async def search_classified_vector_space_model(
+    query: str, k: int = SEARCH_TOP_K
+) -> List[models.Actor]:
     """
     Creates the Queryvector and calculates the cosine similiarity between the Queryvector and the Actor vectors
     """
-    # Get synonyms for the query terms
-    query_synonyms = []
-    query_synonyms.append(query)
-    # for term in query:
-    # query_synonyms.extend(get_some_word_synonyms(term))
-    # classify the query
-    query_classification_map = await classify_query(query_synonyms)
-
-    # create the query vector
-    query_vector = compute_query_vector(query_classification_map)
-
-    # Calculate cosine similarity between the query vector and actor vectors
-    actor_cosine_similarity_map = {}
-    for actor_id, vector in globals._classified_actors_vector_map.items():
-        dot_product = np.dot(query_vector, vector)
-        magnitude_query = np.linalg.norm(query_vector)
-        magnitude_entry = np.linalg.norm(vector)
-        cosine_similarity = dot_product / (magnitude_query * magnitude_entry)
-        actor_value = (
-            cosine_similarity * (1 - FAME_COEFFICIENT_PERCENTAGE)
-            + fame_coefficient_map[actor_id] * FAME_COEFFICIENT_PERCENTAGE
-        )
-        actor_cosine_similarity_map[actor_id] = actor_value
-    # sort cosine similarity descending
-    sorted_actor_cosine_similarity_map = {
-        k: v
-        for k, v in sorted(
-            actor_cosine_similarity_map.items(), key=lambda item: item[1], reverse=True
-        )
-    }
-
-    # return the top 100 actors
-    actors = await get_actors_by_ids(
-        list(sorted_actor_cosine_similarity_map.keys())[:100]
-    )
+    # popular queries are already classified
+    query_vector = await get_cached_query_vector(query)
+
+    if query_vector is None:
+        # Get synonyms for the query terms
+        query_synonyms = []
+        query_synonyms.append(query)
+        # for term in query:
+        # query_synonyms.extend(get_some_word_synonyms(term))
+        # classify the query
+        query_classification_map = await classify_query(query_synonyms)
+
+        # create the query vector
+        query_vector = compute_query_vector(query_classification_map)
+        await cache_query_vector(query, query_vector)
+
+    # Score all actors at once: cosine similarity blended with the fame coefficient
+    actor_scores = score_actor_matrix(query_vector)
+
+    # select the top k actors
+    top_actor_ids, _ = top_k(globals._classified_actor_ids, actor_scores, k)
+
+    # return the top k actors in ranked order
+    actors = await get_ranked_actors(top_actor_ids.tolist())
     return actors
 
 
@@ -70,19 +61,24 @@ async def build_classified_vector_space_model():
     classified_actors = await get_all_actor_classifiers()
 
     # Calculate the fame coefficient map
-    global fame_coefficient_map
     fame_coefficient_map = await calculate_fame_coefficient_map()
 
-    # Caculate vectors for each actor
+    # Caculate vectors for each actor, an actor classified more than once keeps its latest vector
+    actor_vector_map = {}
     for actor in tqdm(classified_actors, desc="Calculating actor vectors"):
         # Calculate the vector for the actor
-        vector = calculate_actor_vector(actor, fame_coefficient_map[actor.actorId])
-        globals._classified_actors_vector_map[actor.actorId] = vector
+        actor_vector_map[actor.actorId] = calculate_actor_vector(actor)
+
+    # Store the vectors in one matrix for the scoring engine
+    actor_ids = list(actor_vector_map.keys())
+    build_actor_matrix(
+        actor_ids,
+        list(actor_vector_map.values()),
+        [fame_coefficient_map[actor_id] for actor_id in actor_ids],
+    )
 
 
-def calculate_actor_vector(
-    actor: models.ActorClassifier, fame_coefficient: float
-) -> List[float]:
+def calculate_actor_vector(actor: models.ActorClassifier) -> List[float]:
     """
     Read the values for the classification and calculate the vector for the actor
     """
@@ -119,8 +115,8 @@ async def classify_query(query: List[str]) -> List[Dict]:
     # Initialize an empty list for query classifications
     query_classifications = []
 
-    # Get the classification results for the given query
-    classifications = get_classification(query)
+    # Get the classification results for the given query, batched with concurrent queries
+    classifications = await get_batched_classification(query)
 
     for classification in classifications:
         # Initialize a dictionary to store emotional label scores for each classification
@@ -170,25 +166,22 @@ def compute_query_vector(query_clasifications: List[Dict]) -> List[float]:
 
 async def calculate_fame_coefficient_map() -> Dict[int, float]:
     """
-    Calculate the fame coefficient for an actor based on their classification scores.
+    Calculate the fame coefficient for an actor based on their number of roles.
     """
-    actors_list = await get_actors_by_most_roles()
-    classified_actors = await get_all_actor_classifiers()
-    classified_actor_ids = [actor.actorId for actor in classified_actors]
-    actor_ids = [
-        actor.id for actor in actors_list if actor.id in classified_actor_ids
-    ]  # only store actor ids that have been classified
+    # classified actors ranked by their number of roles, counted in the database
+    ranked_actors = await get_classified_actor_ranks_by_most_roles()
+    if not ranked_actors:
+        return {}
 
     # should be not that high, because sin similarity is max 1
     max_fame_coefficient = 3
     min_fame_coefficient = 1
 
-    step_value = (max_fame_coefficient - min_fame_coefficient) / len(actor_ids)
+    step_value = (max_fame_coefficient - min_fame_coefficient) / len(ranked_actors)
 
-    # Calculate the coefficient for each actor
+    # Calculate the coefficient for each actor from its rank
     fame_coefficient_map = {}
-    for actor_id in tqdm(actor_ids, desc="Calculating fame coefficient"):
-        fame_coefficient = max_fame_coefficient - step_value * actor_ids.index(actor_id)
-        fame_coefficient_map[actor_id] = fame_coefficient
+    for actor_id, rank in ranked_actors:
+        fame_coefficient_map[actor_id] = max_fame_coefficient - step_value * rank
 
     return fame_coefficient_map
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import sys
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from globals import init_globals
+from data_preprocessing.script_preprocessing import preprocess_scripts
+from data_preprocessing.actor_classfication import classify_actors
+from information_retrieval.classified_vector_space_model import (
+    build_classified_vector_space_model,
+)
+from information_retrieval.token_vector_space_model import (
+    build_token_vector_space_model,
+    execute_singualar_value_decomposition,
+)
+from information_retrieval.index_snapshot import load_index_snapshot, save_index_snapshot
+from db.script import count_scripts
+from db.role import count_roles
+from db.actor_classifier import count_actor_classifiers
+from db.client import disconnect_db
+from config import TOKEN_MODEL_ENABLED, SHARED_INDEX
+
+
+async def get_index_fingerprint() -> Dict[str, int]:
+    """
+    Get the database state the indexes are built from.
+    A snapshot with another fingerprint is stale.
+    """
+    return {
+        "scripts": await count_scripts(),
+        "processed_scripts": await count_scripts(processed_only=True),
+        "roles": await count_roles(),
+        "actor_classifiers": await count_actor_classifiers(),
+        "token_model": int(TOKEN_MODEL_ENABLED),
+    }
+
+
+async def build_index():
+    """
+    Build all indexes from the database
+    """
+    await preprocess_scripts()
+    await classify_actors()
+
+    await build_classified_vector_space_model()
+    if TOKEN_MODEL_ENABLED:
+        await build_token_vector_space_model()
+        await execute_singualar_value_decomposition()
+
+
+async def load_or_build_index():
+    """
+    Load the indexes from the snapshot, only rebuild them if the snapshot is stale
+    """
+    fingerprint = await get_index_fingerprint()
+
+    if any(count < 0 for count in fingerprint.values()):
+        # the database is not reachable, serve the last snapshot
+        print("Could not read the database state, loading the index snapshot as is")
+        if load_index_snapshot():
+            return
+        raise RuntimeError("No index snapshot available and the database is not reachable")
+
+    if load_index_snapshot(fingerprint):
+        return
+
+    print("Rebuilding the indexes")
+    await build_index()
+
+    # preprocessing and classification change the database state
+    save_index_snapshot(await get_index_fingerprint())
+
+
+def attach_shared_index():
+    """
+    Attach to the index snapshot built by the gunicorn master.
+    The arrays are memory-mapped read-only, so all workers share the same pages.
+    """
+    # the master verified the snapshot after building it
+    if not load_index_snapshot(verify_checksums=False):
+        raise RuntimeError("No shared index snapshot available")
+
+
+async def init_index():
+    """
+    Initialize the indexes of a worker
+    """
+    if SHARED_INDEX:
+        attach_shared_index()
+    else:
+        await load_or_build_index()
+
+
+async def main():
+    """
+    Build or refresh the index snapshot
+    """
+    init_globals()
+    try:
+        await load_or_build_index()
+    finally:
+        await disconnect_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import numpy as np
+from scipy.sparse import csr_matrix
+from utils.vocabulary import Vocabulary
+import globals
+from config import (
+    INDEX_SNAPSHOT_VERSION,
+    INDEX_SNAPSHOT_PATH,
+    INDEX_SNAPSHOT_VERIFY_CHECKSUMS,
+)
+
+MANIFEST_FILE_NAME = "manifest.json"
+VOCABULARY_FILE_NAME = "vocabulary.bin"
+
+# snapshot array name -> global variable name
+CLASSIFIED_ARRAYS = {
+    "classified_actor_ids": "_classified_actor_ids",
+    "classified_actor_matrix": "_classified_actor_matrix",
+    "classified_actor_norms": "_classified_actor_norms",
+    "fame_coefficients": "_fame_coefficients",
+}
+TOKEN_ARRAYS = {
+    "document_ids": "_document_ids",
+    "document_norms": "_document_norms",
+    "inverse_document_frequency": "_inverse_document_frequency",
+    "postings_indptr": "_postings_indptr",
+    "postings_rows": "_postings_rows",
+    "postings_tfs": "_postings_tfs",
+}
+LSI_ARRAYS = {
+    "S_reduced": "_S_reduced",
+    "query_projection": "_query_projection",
+    "document_svd_matrix": "_document_svd_matrix",
+}
+
+
+def save_index_snapshot(
+    fingerprint: Dict[str, int], snapshot_path: str = INDEX_SNAPSHOT_PATH
+) -> None:
+    """
+    Store the built indexes as a versioned and checksummed snapshot.
+    Every array is stored in its own .npy file, so it can be memory-mapped when loading.
+    """
+    temporary_path = snapshot_path + ".tmp"
+    shutil.rmtree(temporary_path, ignore_errors=True)
+    os.makedirs(temporary_path)
+
+    arrays = {name: getattr(globals, attr) for name, attr in CLASSIFIED_ARRAYS.items()}
+    components = ["classified"]
+
+    if len(globals._document_ids) > 0:
+        components.append("token")
+        arrays.update({name: getattr(globals, attr) for name, attr in TOKEN_ARRAYS.items()})
+        matrix = globals._document_term_weight_matrix
+        arrays["tfidf_data"] = matrix.data
+        arrays["tfidf_indices"] = matrix.indices
+        arrays["tfidf_indptr"] = matrix.indptr
+        globals._vocabulary.save(os.path.join(temporary_path, VOCABULARY_FILE_NAME))
+
+    if len(globals._document_svd_matrix) > 0:
+        components.append("lsi")
+        arrays.update({name: getattr(globals, attr) for name, attr in LSI_ARRAYS.items()})
+
+    for name, array in arrays.items():
+        np.save(os.path.join(temporary_path, name + ".npy"), np.asarray(array))
+
+    files = sorted(os.listdir(temporary_path))
+    manifest = {
+        "version": INDEX_SNAPSHOT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "fingerprint": fingerprint,
+        "components": components,
+        "tfidf_shape": (
+            list(globals._document_term_weight_matrix.shape)
+            if "token" in components
+            else None
+        ),
+        "checksums": {
+            file_name: compute_checksum(os.path.join(temporary_path, file_name))
+            for file_name in files
+        },
+    }
+    with open(os.path.join(temporary_path, MANIFEST_FILE_NAME), "w") as file:
+        json.dump(manifest, file, indent=2)
+
+    # swap in the new snapshot only once it is complete
+    old_path = snapshot_path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(snapshot_path):
+        os.rename(snapshot_path, old_path)
+    os.rename(temporary_path, snapshot_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    print(f"Index snapshot stored in {snapshot_path} ({', '.join(components)})")
+
+
+def load_index_snapshot(
+    fingerprint: Optional[Dict[str, int]] = None,
+    snapshot_path: str = INDEX_SNAPSHOT_PATH,
+    verify_checksums: bool = INDEX_SNAPSHOT_VERIFY_CHECKSUMS,
+) -> bool:
+    """
+    Load the indexes from the snapshot, the arrays are memory-mapped read-only.
+    Returns False if the snapshot is missing, corrupt, of another version or stale,
+    a snapshot is stale if its fingerprint differs from the given one.
+    """
+    manifest = read_manifest(snapshot_path)
+    if manifest is None:
+        print("No index snapshot found")
+        return False
+
+    if manifest["version"] != INDEX_SNAPSHOT_VERSION:
+        print(f"Index snapshot has version {manifest['version']}, expected {INDEX_SNAPSHOT_VERSION}")
+        return False
+
+    if fingerprint is not None and manifest["fingerprint"] != fingerprint:
+        print("Index snapshot is stale")
+        return False
+
+    if verify_checksums:
+        for file_name, checksum in manifest["checksums"].items():
+            if compute_checksum(os.path.join(snapshot_path, file_name)) != checksum:
+                print(f"Index snapshot file {file_name} is corrupt")
+                return False
+
+    def load_array(name: str) -> np.ndarray:
+        return np.load(os.path.join(snapshot_path, name + ".npy"), mmap_mode="r")
+
+    components = manifest["components"]
+    arrays = dict(CLASSIFIED_ARRAYS)
+    if "token" in components:
+        arrays.update(TOKEN_ARRAYS)
+    if "lsi" in components:
+        arrays.update(LSI_ARRAYS)
+
+    for name, attr in arrays.items():
+        setattr(globals, attr, load_array(name))
+
+    if "token" in components:
+        vocabulary = Vocabulary.load(os.path.join(snapshot_path, VOCABULARY_FILE_NAME))
+        if vocabulary is None:
+            return False
+        globals._vocabulary = vocabulary
+        globals._document_term_weight_matrix = csr_matrix(
+            (load_array("tfidf_data"), load_array("tfidf_indices"), load_array("tfidf_indptr")),
+            shape=tuple(manifest["tfidf_shape"]),
+            copy=False,
+        )
+
+    print(f"Index snapshot loaded from {snapshot_path} ({', '.join(components)})")
+    return True
+
+
+def read_manifest(snapshot_path: str = INDEX_SNAPSHOT_PATH) -> Optional[Dict]:
+    """
+    Read the manifest of the snapshot, None if there is no snapshot
+    """
+    manifest_path = os.path.join(snapshot_path, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r") as file:
+            return json.load(file)
+    except ValueError as e:
+        print(f"An error occurred while reading the index snapshot manifest: {e}")
+        return None
+
+
+def compute_checksum(file_path: str) -> str:
+    """
+    Calculate the sha256 checksum of a file
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
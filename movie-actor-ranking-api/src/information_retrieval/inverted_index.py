@@ -0,0 +1,103 @@
+from typing import Dict, List, Tuple
+import numpy as np
+from prisma import models
+from tqdm import tqdm
+import globals
+from data_preprocessing.script_preprocessing import preprocess_query
+
+
+def build_inverted_index(actors: List[models.Actor]) -> List[Dict[int, int]]:
+    """
+    Build the inverted index for the actors with a single tokenization pass over their processed dialogues.
+    The postings list of a term holds (document row, tf) pairs, the row maps to the actor id via globals._document_ids.
+
+    :return: term id -> tf map of every document, in the same order as the actors
+    """
+    globals._document_ids = np.fromiter(
+        (actor.id for actor in actors), dtype=np.int64, count=len(actors)
+    )
+
+    postings = {}
+    document_term_frequencies = []
+    for row, actor in enumerate(tqdm(actors, desc="Building inverted index")):
+        term_frequencies = tokenize_actor_dialogues(actor)
+        document_term_frequencies.append(term_frequencies)
+
+        for term_id, tf in term_frequencies.items():
+            postings.setdefault(term_id, []).append((row, tf))
+
+    # store all postings lists in flat arrays, the postings of term t are at _postings_indptr[t]:_postings_indptr[t + 1]
+    postings_indptr = np.zeros(len(globals._vocabulary) + 1, dtype=np.int64)
+    for term_id, posting in postings.items():
+        postings_indptr[term_id + 1] = len(posting)
+    postings_indptr = np.cumsum(postings_indptr)
+
+    postings_rows = np.zeros(postings_indptr[-1], dtype=np.int32)
+    postings_tfs = np.zeros(postings_indptr[-1], dtype=np.int32)
+    for term_id, posting in postings.items():
+        start = postings_indptr[term_id]
+        postings_rows[start : start + len(posting)] = [row for row, _ in posting]
+        postings_tfs[start : start + len(posting)] = [tf for _, tf in posting]
+
+    globals._postings_indptr = postings_indptr
+    globals._postings_rows = postings_rows
+    globals._postings_tfs = postings_tfs
+
+    print(f"Inverted index built: {len(postings)} terms, {len(actors)} documents")
+    return document_term_frequencies
+
+
+def tokenize_actor_dialogues(actor: models.Actor) -> Dict[int, int]:
+    """
+    Count the vocabulary terms in all processed dialogues of an actor
+    """
+    return globals._vocabulary.count_term_ids(
+        token
+        for role in actor.roles
+        for script in role.scripts
+        if script.processedDialogue
+        for token in script.processedDialogue.split()
+    )
+
+
+def get_document_frequencies() -> np.ndarray:
+    """
+    Get the number of documents containing each vocabulary term
+    """
+    return np.diff(globals._postings_indptr)
+
+
+def get_postings(term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the postings list (document rows, tfs) of a term
+    """
+    start = globals._postings_indptr[term_id]
+    end = globals._postings_indptr[term_id + 1]
+    return globals._postings_rows[start:end], globals._postings_tfs[start:end]
+
+
+def get_query_term_frequencies(query: str) -> Dict[int, int]:
+    """
+    Preprocess the query like the scripts and count its vocabulary terms
+    """
+    return globals._vocabulary.count_term_ids(preprocess_query(query))
+
+
+def score_postings(query_weights: Dict[int, float]) -> np.ndarray:
+    """
+    Calculate the cosine similarity between the query and every document by only touching the postings of the query terms.
+    """
+    scores = np.zeros(len(globals._document_ids), dtype=np.float32)
+
+    for term_id, query_weight in query_weights.items():
+        rows, tfs = get_postings(term_id)
+        if len(rows) == 0:
+            continue
+        document_weights = (1 + np.log(tfs)) * globals._inverse_document_frequency[term_id]
+        scores[rows] += query_weight * document_weights
+
+    # normalize by the document and query norms
+    magnitude_query = np.linalg.norm(list(query_weights.values()))
+    denominator = globals._document_norms * magnitude_query
+    np.divide(scores, denominator, out=scores, where=denominator > 0)
+    return scores
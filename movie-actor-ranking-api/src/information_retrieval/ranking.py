@@ -0,0 +1,38 @@
+from typing import Tuple
+import numpy as np
+from config import SEARCH_TOP_K
+
+
+def top_k(
+    actor_ids: np.ndarray, scores: np.ndarray, k: int = SEARCH_TOP_K
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Select the k best scored actors without sorting all of them.
+    Ties are broken by the lower actor id, so the ranking is deterministic.
+
+    :param actor_ids: actor id for each score
+    :param scores: score for each actor
+    :param k: number of actors to return
+    :return: actor ids and scores of the top k actors, ordered by rank
+    """
+    actor_ids = np.asarray(actor_ids)
+    # nan scores (e.g. a zero vector in the cosine similarity) are ranked last
+    scores = np.nan_to_num(np.asarray(scores), nan=-np.inf)
+
+    if k <= 0 or len(scores) == 0:
+        return actor_ids[:0], scores[:0]
+
+    if k < len(scores):
+        # partial selection: O(N) instead of O(N log N)
+        partition = np.argpartition(-scores, k - 1)[:k]
+        threshold = scores[partition].min()
+        # keep every actor that ties with the k-th score for the tie-break
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(len(scores))
+
+    # sort the candidates by score descending, then by actor id ascending
+    order = np.lexsort((actor_ids[candidates], -scores[candidates]))[:k]
+    rows = candidates[order]
+
+    return actor_ids[rows], scores[rows]
@@ -1,85 +1,96 @@
 import math
-from typing import Any, List
+from typing import Dict, List, Tuple
 import numpy as np
-from db.actor import get_all_actors, get_all_actors_dialogues_processed
-from db.script import get_all_scripts
-from db.role import get_all_roles
+from prisma import models
+from db.actor import get_all_actors_dialogues_processed
+from information_retrieval.actor_store import get_ranked_actors
 import globals
 from tqdm import tqdm
-from concurrent.futures import ProcessPoolExecutor
-import os
-from prisma import models
-
-
-async def search_token_vector_space_model(query: str) -> List[int]:
+from scipy.sparse import csr_matrix
+from sklearn.utils.extmath import randomized_svd
+from information_retrieval.inverted_index import (
+    build_inverted_index,
+    get_document_frequencies,
+    get_query_term_frequencies,
+    score_postings,
+)
+from information_retrieval.ranking import top_k
+from config import (
+    SEARCH_TOP_K,
+    SVD_MODE,
+    SVD_COMPONENTS,
+    SVD_MAX_COMPONENTS,
+    SVD_ENERGY_THRESHOLD,
+)
+
+
+async def search_token_vector_space_model(
+    query: str, k: int = SEARCH_TOP_K
+) -> List[models.Actor]:
     """
     Creates the Queryvector and calculates the cosine similiarity between the Queryvector and the Documentvectors
     """
-    actors = await get_all_actors()
-    # Calculate the document frequency (DF) for each term
-    total_documents = len(actors)
-    inverse_document_frequency = {}
-    # Matrix dimension 1x1
-
-    for term in globals._vocabulary:
-        df = globals._document_frequency[term]
-        # Calculate the inverse document frequency (IDF) for each term
-        inverse_document_frequency[term] = compute_inverse_document_frequency(
-            total_documents, df
+    if len(globals._document_ids) == 0:
+        # the token model is not built (TOKEN_MODEL_ENABLED=false)
+        return []
+
+    # preprocess the query like the scripts and count the vocabulary terms
+    query_term_frequencies = get_query_term_frequencies(query)
+
+    # creating the sparse tfidf-query vector, only the query terms have a weight
+    query_weights = {
+        term_id: compute_tf_idf_weighting(
+            compute_sublinear_tf_scaling(tf),
+            globals._inverse_document_frequency[term_id],
         )
+        for term_id, tf in query_term_frequencies.items()
+    }
 
-    # creating the tfidf-query vector
-    tfidf_vector = [
-        compute_tf_idf_weighting(
-            compute_sublinear_tf_scaling(query.count(term)),
-            inverse_document_frequency[term],
+    if len(globals._document_svd_matrix) == 0:
+        # no dimension reduction, score the documents with the inverted index
+        top_doc_ids, top_scores = top_k(
+            globals._document_ids, score_postings(query_weights), k
         )
-        for term in globals._vocabulary
-    ]
+        return await get_ranked_actors(top_doc_ids[top_scores > 0.0].tolist())
 
-    flat_transposed_query_vector = calculate_dimension_reduced_query(tfidf_vector)
-
-    # Map each document by id to the corressponding cosinec similiarity
-    doc_cosine_similiarity_map = {}
-    for doc_id, vector in globals._document_svd_matrix.items():
-        # Calculate the Cosine similiarity by using the numpy library
-        # Calculating the dot product between the Queryvector and the Documentvector
-        dot_product = np.dot(flat_transposed_query_vector, vector)
-        # Calculate the norms for the Queryvector and the Documentvector
-        magnitude_query = np.linalg.norm(flat_transposed_query_vector)
-        magnitude_entry = np.linalg.norm(vector)
-        # Calculating the Cosine similiarity
-        cosine_similarity = dot_product / (magnitude_query * magnitude_entry)
-        # Adding the Results to the map created before
-        doc_cosine_similiarity_map[doc_id] = cosine_similarity
-    # Sort the map by the highest cosine similiarity, lambda takes the second index in the tuple and used these to sort
-    sorted_docs = sorted(
-        doc_cosine_similiarity_map.items(), key=lambda x: x[1], reverse=True
-    )
-    # Extract the sorted document IDs into a list
-    # In this contex "_" is a placeholder, we are not interested in it so we use this convention
-    sorted_doc_ids = [doc_id for doc_id, _ in sorted_docs if _ > 0.0]
+    reduced_query_vector = calculate_dimension_reduced_query(query_weights)
 
-    return sorted_doc_ids
+    # Calculate the cosine similiarity with all normalized document vectors at once
+    magnitude_query = np.linalg.norm(reduced_query_vector)
+    if magnitude_query > 0:
+        cosine_similarities = globals._document_svd_matrix @ (
+            reduced_query_vector / magnitude_query
+        )
+    else:
+        cosine_similarities = np.zeros(len(globals._document_ids), dtype=np.float32)
 
+    # Select the documents with the highest cosine similiarity
+    top_doc_ids, top_scores = top_k(globals._document_ids, cosine_similarities, k)
+    # Only keep documents that are similar to the query
+    sorted_doc_ids = top_doc_ids[top_scores > 0.0].tolist()
+
+    # return the actors of the documents in ranked order
+    return await get_ranked_actors(sorted_doc_ids)
 
-def compute_tfidf_vector(vocabulary, actor: models.Actor, inverse_document_frequency):
-    # Get all processed dialogues for an actor
-    all_processed_dialogues = " ".join(
-        script.processedDialogue
-        for role in actor.roles
-        for script in role.scripts
-        if script.processedDialogue
-    )
 
-    tfidf_vector = [
-        compute_tf_idf_weighting(
-            compute_sublinear_tf_scaling(all_processed_dialogues.count(term)),
-            inverse_document_frequency.get(term, 0),
+def compute_tfidf_vector(
+    term_frequencies: Dict[int, int], inverse_document_frequency: np.ndarray
+) -> Tuple[List[int], List[float]]:
+    """
+    Calculate the sparse tfidf vector of a document from its term frequencies
+    """
+    # only store the non zero weights of the sparse tfidf vector
+    term_indices = []
+    tfidf_weights = []
+    for term_index, tf in sorted(term_frequencies.items()):
+        weight = compute_tf_idf_weighting(
+            compute_sublinear_tf_scaling(tf),
+            inverse_document_frequency[term_index],
         )
-        for term in vocabulary
-    ]
-    return actor.id, tfidf_vector
+        if weight != 0:
+            term_indices.append(term_index)
+            tfidf_weights.append(weight)
+    return term_indices, tfidf_weights
 
 
 async def build_token_vector_space_model():
@@ -90,41 +101,72 @@ async def build_token_vector_space_model():
 
     actors = await get_all_actors_dialogues_processed()
 
-    # Calculate the document frequency (DF) for each term
+    # Tokenize every document once and build the inverted index
+    document_term_frequencies = build_inverted_index(actors)
+
+    # Calculate the document frequency (DF) for each term, it is the length of the postings list
     total_documents = len(actors)
-    inverse_document_frequency = {}
-
-    for term in globals._vocabulary:
-        # Calculate the df it is the length of the linked list of occurance documents for a particular term
-        df: int = globals._document_frequency.get(
-            term, 0
-        )  # Use .get() to avoid KeyError
-        # Calculate the inverse document frequency (IDF) for each term
-        inverse_document_frequency[term] = compute_inverse_document_frequency(
-            total_documents, df
-        )
+    document_frequencies = get_document_frequencies()
+
+    # Calculate the inverse document frequency (IDF) for each term
+    inverse_document_frequency = np.zeros(len(globals._vocabulary))
+    for term_id, df in enumerate(document_frequencies.tolist()):
+        if df > 0:
+            inverse_document_frequency[term_id] = compute_inverse_document_frequency(
+                total_documents, df
+            )
+    globals._inverse_document_frequency = inverse_document_frequency
 
     # Calculate the tfidf vector for each actor
-    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
-        results = list(
-            tqdm(
-                executor.map(
-                    compute_tfidf_vector,
-                    [globals._vocabulary] * len(actors),
-                    actors,
-                    [inverse_document_frequency] * len(actors),
-                ),
-                total=len(actors),
-            )
+    results = [
+        compute_tfidf_vector(term_frequencies, inverse_document_frequency)
+        for term_frequencies in tqdm(
+            document_term_frequencies, desc="Calculating tfidf vectors"
         )
+    ]
 
-    for actor_id, tfidf_vector in results:
-        globals._document_term_weight_matrix.append(tfidf_vector)
-        globals._document_id_vector_map[actor_id] = tfidf_vector
+    # Build the sparse document term matrix, row i belongs to the actor _document_ids[i]
+    indptr = np.zeros(len(results) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(term_indices) for term_indices, _ in results])
+    indices = np.fromiter(
+        (i for term_indices, _ in results for i in term_indices),
+        dtype=np.int32,
+        count=indptr[-1],
+    )
+    data = np.fromiter(
+        (w for _, tfidf_weights in results for w in tfidf_weights),
+        dtype=np.float32,
+        count=indptr[-1],
+    )
 
+    globals._document_term_weight_matrix = csr_matrix(
+        (data, indices, indptr), shape=(len(results), len(globals._vocabulary))
+    )
+    # document norms for the cosine similarity of the inverted index
+    globals._document_norms = np.sqrt(
+        globals._document_term_weight_matrix.multiply(
+            globals._document_term_weight_matrix
+        ).sum(axis=1)
+    ).A1.astype(np.float32)
+
+    print_sparse_matrix_memory(globals._document_term_weight_matrix)
     print("Vector Space Model Built")
 
 
+def print_sparse_matrix_memory(matrix: csr_matrix) -> None:
+    """
+    Print the memory used by the sparse matrix compared to a dense float32 layout
+    """
+    sparse_bytes = matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    dense_bytes = matrix.shape[0] * matrix.shape[1] * np.dtype(np.float32).itemsize
+    density = matrix.nnz / max(matrix.shape[0] * matrix.shape[1], 1)
+    print(
+        f"Document term matrix: shape {matrix.shape}, {matrix.nnz} non zero entries "
+        f"({density:.2%} density), {sparse_bytes / 1024**2:.1f} MB "
+        f"(dense: {dense_bytes / 1024**2:.1f} MB)"
+    )
+
+
 def compute_inverse_document_frequency(N: int, df: int) -> float:
     return math.log2(N / df)
 
@@ -139,82 +181,95 @@ def compute_sublinear_tf_scaling(tf: int) -> float:
     return 0
 
 
-def calculate_dimension_reduced_query(
-    tfidf_query_vector: List[float],
-) -> np.ndarray[Any]:
+def calculate_dimension_reduced_query(query_weights: Dict[int, float]) -> np.ndarray:
     """
     Calculate the dimension reduced query with the following formula: q = q^T * U_k * S_k^-1
+    The projection operator U_k * S_k^-1 is precomputed, so only the rows of the query terms are used.
     """
-    # transpose tfidf vector to calculate the new dimensional reduced query vector
-    square_s_reduced = np.diag(globals._S_reduced)
-    # Check if the matrix is invertible
-    if np.linalg.det(square_s_reduced) == 0:
-        print("The matrix is singular and cannot be inverted.")
-    else:
-        # Calculate the inverse
-        s_k_inv = np.linalg.inv(square_s_reduced)
+    if len(query_weights) == 0:
+        return np.zeros(globals._query_projection.shape[1], dtype=np.float32)
 
-    # convert the tfidf_vector to a numpy matrix shape = (k,1)
-    numpy_matrix_query = np.matrix(tfidf_query_vector)
-
-    # calculate the new dimension reduced query with following formular q = q^T * U_k * S_k^-1
-    reduced_query_vector_U = np.dot(numpy_matrix_query, globals._U_reduced)
-    reduced_query_vector = np.dot(reduced_query_vector_U, s_k_inv)
-
-    # reduced query has the shape of (1,k); in order to calculate the cosine similiarity we need to transpose the vector back in the shape (k,1)
-    transposed_query_vector = np.transpose(reduced_query_vector)
-    # convert reduced query vector to a matrix with shape (k,) numpy specific read numpy doc for specification
-    flat_transposed_query_vector = np.ravel(transposed_query_vector)
+    term_ids = np.fromiter(query_weights.keys(), dtype=np.int64, count=len(query_weights))
+    weights = np.fromiter(
+        query_weights.values(), dtype=np.float32, count=len(query_weights)
+    )
 
-    return flat_transposed_query_vector
+    # sparse query times dense projection operator, shape (k,)
+    return weights @ globals._query_projection[term_ids]
 
 
 async def execute_singualar_value_decomposition():
     """
     Singular Value Decomposition
     """
-    print("Start Executing SVD")
-    documents_vector_list = list(
-        globals._document_id_vector_map.items()
-    )  # get the list of documents and their vectors
-    vector_list = [
-        vector for _, vector in documents_vector_list
-    ]  # get the list of vectors
-    documentids_list = [
-        doc_id for doc_id, _ in documents_vector_list
-    ]  # get the list of document ids
-    original_matrix = np.matrix(vector_list)  # create a matrix from the list of vectors
+    print(f"Start Executing SVD ({SVD_MODE})")
     original_matrix = (
-        original_matrix.transpose()
+        globals._document_term_weight_matrix.transpose().tocsr()
     )  # transpose the matrix to get the word to document matrix
 
-    U, S, Vt = np.linalg.svd(original_matrix)
+    # the energy of the matrix is the sum of all squared singular values (squared frobenius norm)
+    total_energy = original_matrix.multiply(original_matrix).sum()
+    max_components = max(min(original_matrix.shape) - 1, 1)
+
+    if SVD_MODE == "full":
+        U, S, Vt = np.linalg.svd(original_matrix.toarray(), full_matrices=False)
+    else:
+        # only compute the top factors directly from the sparse matrix
+        n_components = SVD_COMPONENTS if SVD_COMPONENTS > 0 else SVD_MAX_COMPONENTS
+        U, S, Vt = randomized_svd(
+            original_matrix,
+            n_components=min(n_components, max_components),
+            random_state=0,
+        )
 
-    # get the number of values that represent 90% of the sum
-    sum_of_values = sum(S)
-    threshold = sum_of_values * 0.9
-    current_sum = 0
-    for k, value in enumerate(S):
-        current_sum += value
-        if (
-            current_sum > threshold
-        ):  # if the sum of the values is greater than the threshold, break
-            break
+    if SVD_COMPONENTS > 0:
+        # fixed number of dimensions
+        k = min(SVD_COMPONENTS, len(S))
+    else:
+        # get the number of values that represent SVD_ENERGY_THRESHOLD of the energy
+        cumulative_energy = np.cumsum(S**2)
+        k = int(
+            np.searchsorted(cumulative_energy, total_energy * SVD_ENERGY_THRESHOLD) + 1
+        )
+        if k > len(S):
+            print(
+                f"{SVD_MAX_COMPONENTS} dimensions only cover "
+                f"{cumulative_energy[-1] / total_energy:.0%} of the energy"
+            )
+            k = len(S)
 
     # reduce the dimensionality of the matrix
-    globals._U_reduced = U[:, :k]
-    globals.S_reduced = S[:k]
+    globals._U_reduced = np.ascontiguousarray(U[:, :k], dtype=np.float32)
+    globals._S_reduced = np.asarray(S[:k], dtype=np.float32)
     Vt_reduced = Vt[:k, :]
-    globals._V_reduced = (
-        Vt_reduced.transpose()
+    globals._V_reduced = np.ascontiguousarray(
+        Vt_reduced.transpose(), dtype=np.float32
     )  # transpose the matrix to get the document to word matrix
 
-    # assign reduced eigenvectors to documents
-    i = 0
-    for doc_id in documentids_list:
-        vector = np.ravel(
-            globals._V_reduced[i, :]
-        )  # Get the ith row of the V_reduced matrix and convert it to a 1D array
-        globals._document_svd_matrix[doc_id] = vector
-        i += 1
-    print("SVD executed")
+    build_query_projection()
+    print(f"SVD executed, {k} dimensions")
+
+
+def build_query_projection() -> None:
+    """
+    Precompute the query projection operator U_k * S_k^-1 and the normalized document vectors.
+    Row i of _document_svd_matrix belongs to the document _document_ids[i].
+    """
+    # S_k is diagonal, so its inverse is the reciprocal of the singular values
+    s_k_inv = np.zeros_like(globals._S_reduced)
+    np.divide(1, globals._S_reduced, out=s_k_inv, where=globals._S_reduced != 0)
+    globals._query_projection = np.ascontiguousarray(
+        globals._U_reduced * s_k_inv, dtype=np.float32
+    )
+
+    # normalize the reduced document vectors for the cosine similiarity
+    norms = np.linalg.norm(globals._V_reduced, axis=1, keepdims=True)
+    globals._document_svd_matrix = np.ascontiguousarray(
+        np.divide(
+            globals._V_reduced,
+            norms,
+            out=np.zeros_like(globals._V_reduced),
+            where=norms > 0,
+        ),
+        dtype=np.float32,
+    )
@@ -7,16 +7,19 @@ from slowapi.util import get_remote_address
 from slowapi.middleware import SlowAPIMiddleware
 from slowapi.errors import RateLimitExceeded
 import uvicorn
+import globals
 from globals import init_globals
-from data_preprocessing.script_preprocessing import preprocess_scripts
-from information_retrieval.token_vector_space_model import (
-    build_token_vector_space_model, execute_singualar_value_decomposition
+from utils.resource_manager import ensure_nltk_resources
+from db.client import connect_db, disconnect_db
+from information_retrieval.index_builder import init_index
+from information_retrieval.actor_store import preload_actor_store
+from utils.classification import load_classification_model, warmup_classification_model
+from utils.inference_executor import (
+    init_inference_executor,
+    shutdown_inference_executor,
 )
-from information_retrieval.classified_vector_space_model import (
-    build_classified_vector_space_model,
-)
-from utils.classification import load_classification_model
-from data_preprocessing.actor_classfication import classify_actors
+from utils.micro_batcher import start_micro_batcher, stop_micro_batcher
+from config import ACTOR_STORE_PRELOAD
 
 limiter = Limiter(key_func=get_remote_address, default_limits=["30/minute"])
 
@@ -26,16 +29,28 @@ async def lifespan(app: FastAPI):
     print("FastAPI app started.")
 
     init_globals()
+    try:
+        await connect_db()
+    except Exception as e:
+        # the db helpers connect again on first use
+        print(f"An error occurred while connecting to the database: {e}")
+    # the model and the nltk resources are loaded from the local copies of the host
+    ensure_nltk_resources()
     load_classification_model()
+    warmup_classification_model()
+    init_inference_executor()
+    start_micro_batcher()
 
-    await preprocess_scripts()
-    await classify_actors()
-
-    await build_classified_vector_space_model()
-    #await build_token_vector_space_model()
-    #await execute_singualar_value_decomposition()
+    # load the index snapshot, preprocessing and classification only run if it is stale
+    await init_index()
+    if ACTOR_STORE_PRELOAD:
+        await preload_actor_store(globals._classified_actor_ids.tolist())
     yield
 
+    await stop_micro_batcher()
+    shutdown_inference_executor()
+    await disconnect_db()
+
 
 app = FastAPI(
     title="Movie Actor Ranking API",
@@ -1,30 +1,193 @@
 from typing import List
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification, PreTrainedTokenizer
 import globals
+import time
+from utils.inference_backend import load_inference_backend
+from utils.resource_manager import resolve_model_path
+from config import (
+    CLASSIFICATION_MODEL_NAME,
+    CLASSIFICATION_MODEL_REVISION,
+    CLASSIFICATION_BACKEND,
+    CLASSIFICATION_QUANTIZE,
+    MICRO_BATCH_MAX_SIZE,
+)
 
+WARMUP_TEXTS = [
+    "I love you, you are the best person in the world.",
+    "I hate you, you are the worst person in the world.",
+]
 
-def load_classification_model() -> pipeline:
+
+# model loaded by the gunicorn master before it forks the workers, see preload_classification_model
+preloaded_model = None
+preloaded_num_threads = None
+
+
+def preload_classification_model() -> None:
+    """
+    Load the weights of the classification model in the gunicorn master, the forked workers
+    build their inference backend from it and share the fp32 weights copy-on-write.
+    The onnx backend runs its own copy of the weights, so nothing is preloaded for it.
+    """
+    global preloaded_model, preloaded_num_threads
+    if CLASSIFICATION_BACKEND == "onnx":
+        return
+
+    # load on the calling thread only, a thread pool of torch does not survive the fork
+    preloaded_num_threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    preloaded_model = AutoModelForSequenceClassification.from_pretrained(
+        resolve_model_path(), local_files_only=True
+    )
+    print("Classification model preloaded for the workers")
+
+
+def load_classification_model():
+    """
+    Load the classification model and tokenizer from the local model cache,
+    they are only downloaded from the Hugging Face model hub if they are missing.
+    A model preloaded by the gunicorn master is reused instead of loading it again.
+    Only the tokenizer, the model config and the inference backend are kept,
+    the backend holds the only copy of the weights.
+    """
+    model_path = resolve_model_path()
+    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    if preloaded_model is not None:
+        # the worker runs with the threads the master loaded without
+        torch.set_num_threads(preloaded_num_threads)
+        model = preloaded_model
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(
+            model_path, local_files_only=True
+        )
+
+    globals._classification_tokenizer = tokenizer
+    globals._classification_config = model.config
+    globals._classification_backend = load_inference_backend(model, tokenizer)
+    return globals._classification_backend
+
+
+def warmup_classification_model() -> None:
+    """
+    Run the first batches through the model before serving, so the first queries do not pay
+    for the lazy initialization of the backend
+    """
+    started = time.perf_counter()
+    get_classification(WARMUP_TEXTS[:1])
+    get_classification(
+        (WARMUP_TEXTS * MICRO_BATCH_MAX_SIZE)[:MICRO_BATCH_MAX_SIZE],
+        batch_size=MICRO_BATCH_MAX_SIZE,
+    )
+    print(f"Classification model warmed up in {time.perf_counter() - started:.2f}s")
+
+
+def get_classification_backend():
+    """
+    Get the inference backend of the classification model, it is loaded on first use
+    """
+    if globals._classification_backend is None:
+        load_classification_model()
+    return globals._classification_backend
+
+
+def get_classification_tokenizer() -> PreTrainedTokenizer:
     """
-    Load the classification model and tokenizer from the Hugging Face model hub
+    Get the tokenizer of the classification model, it is loaded on first use
     """
-    model_name = "zbnsl/bert-base-uncased-emotionsModified"
+    get_classification_backend()
+    return globals._classification_tokenizer
 
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSequenceClassification.from_pretrained(model_name)
 
-    # Initialize the pipeline with the local model and tokenizer
-    globals._classifier = pipeline(
-        task="text-classification", model=model, tokenizer=tokenizer, top_k=None
+def get_max_chunk_tokens() -> int:
+    """
+    Get the number of tokens of a text the model accepts, without the special tokens
+    """
+    tokenizer = get_classification_tokenizer()
+    max_length = min(
+        tokenizer.model_max_length,
+        globals._classification_config.max_position_embeddings,
+    )
+    return max_length - tokenizer.num_special_tokens_to_add()
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    """
+    Turn the logits into scores, same as the pipeline for single label models
+    """
+    exponentials = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exponentials / exponentials.sum(axis=-1, keepdims=True)
+
+
+def get_classification_labels() -> List[str]:
+    """
+    Get the labels of the model in the order of its outputs
+    """
+    get_classification_backend()
+    config = globals._classification_config
+    return [config.id2label[i] for i in range(config.num_labels)]
+
+
+def classify_token_ids(token_ids: List[List[int]]) -> np.ndarray:
+    """
+    Classify already tokenized texts in one padded batch, without tokenizing them again.
+    The token ids must not contain the special tokens.
+
+    :return: scores in the order of get_classification_labels, one row per text
+    """
+    tokenizer = get_classification_tokenizer()
+    inputs = tokenizer.pad(
+        {"input_ids": [tokenizer.build_inputs_with_special_tokens(ids) for ids in token_ids]},
+        return_tensors="np",
+    )
+    return softmax(
+        get_classification_backend().run(inputs["input_ids"], inputs["attention_mask"])
+    )
+
+
+def get_classification_model_key() -> str:
+    """
+    Identify the model that produces the scores, cached scores are only valid for the same key
+    """
+    # the revision pins the weights, the fp32 backends match the reference,
+    # int8 weights change the scores and every backend quantizes them differently
+    return f"{CLASSIFICATION_MODEL_NAME}@{CLASSIFICATION_MODEL_REVISION}" + (
+        f":{CLASSIFICATION_BACKEND}-int8" if CLASSIFICATION_QUANTIZE else ""
     )
-    return globals._classifier
 
 
-def get_classification(text: List[str]) -> List[dict]:
+def get_classification(text: List[str], batch_size: int = 1) -> List[List[dict]]:
     """
-    Perform text classification using the loaded model
+    Perform text classification using the inference backend.
+    With a batch_size > 1 the texts are padded and run through the model together.
+    Returns the labels with their scores, highest score first, like the pipeline.
     """
-    if globals._classifier is None:
-        globals._classifier = load_classification_model()
+    tokenizer = get_classification_tokenizer()
+    labels = get_classification_labels()
+    max_length = get_max_chunk_tokens() + tokenizer.num_special_tokens_to_add()
 
-    # Perform classification
-    return globals._classifier(text)
+    classifications = []
+    for i in range(0, len(text), max(batch_size, 1)):
+        inputs = tokenizer(
+            text[i : i + max(batch_size, 1)],
+            padding=True,
+            truncation=True,
+            max_length=max_length,
+            return_tensors="np",
+        )
+        scores = softmax(
+            get_classification_backend().run(inputs["input_ids"], inputs["attention_mask"])
+        )
+        for row in scores.tolist():
+            classifications.append(
+                sorted(
+                    (
+                        {"label": label, "score": score}
+                        for label, score in zip(labels, row)
+                    ),
+                    key=lambda label_score: label_score["score"],
+                    reverse=True,
+                )
+            )
+    return classifications
@@ -0,0 +1,145 @@
+import argparse
+import os
+import sys
+import time
+from typing import List
+
+import numpy as np
+from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+import globals
+from utils.classification import (
+    get_classification,
+    get_classification_labels,
+    load_classification_model,
+)
+from utils.resource_manager import resolve_model_path
+from config import CLASSIFICATION_BACKEND, CLASSIFICATION_QUANTIZE
+
+SAMPLE_TEXTS = [
+    "I love you, you are the best person in the world.",
+    "I hate you, you are the worst person in the world.",
+    "Get out of here before they find us, they will kill us all.",
+    "I can't believe it, you came back after all these years!",
+    "She is gone and nothing will ever be the same again.",
+    "Why would you do that? I trusted you and you lied to me.",
+    "We won! We actually won the whole thing!",
+    "Something is moving in the dark, stay close to me.",
+]
+
+
+# fp32 pytorch pipeline, the reference of the backends, only loaded by this script
+reference_pipeline = None
+
+
+def get_reference_classification(text: List[str], batch_size: int = 1) -> List[List[dict]]:
+    """
+    Perform text classification with the fp32 pytorch pipeline, it is loaded on first use
+    """
+    global reference_pipeline
+    if reference_pipeline is None:
+        model_path = resolve_model_path()
+        reference_pipeline = pipeline(
+            task="text-classification",
+            model=AutoModelForSequenceClassification.from_pretrained(
+                model_path, local_files_only=True
+            ),
+            tokenizer=AutoTokenizer.from_pretrained(model_path, local_files_only=True),
+            top_k=None,
+        )
+    return reference_pipeline(text, batch_size=batch_size)
+
+
+def to_score_matrix(classifications: List[List[dict]], labels: List[str]) -> np.ndarray:
+    """
+    Convert the classifications into a matrix of scores in the order of the labels
+    """
+    return np.array(
+        [
+            [
+                next(item["score"] for item in classification if item["label"] == label)
+                for label in labels
+            ]
+            for classification in classifications
+        ]
+    )
+
+
+def check_parity(texts: List[str], tolerance: float) -> bool:
+    """
+    Compare the scores of the inference backend with the scores of the reference pipeline
+    """
+    labels = get_classification_labels()
+    reference_scores = to_score_matrix(get_reference_classification(texts), labels)
+    backend_scores = to_score_matrix(get_classification(texts), labels)
+
+    max_difference = float(np.abs(reference_scores - backend_scores).max())
+    top_label_agreement = float(
+        np.mean(reference_scores.argmax(axis=1) == backend_scores.argmax(axis=1))
+    )
+    passed = max_difference <= tolerance
+    print(
+        f"Parity: max score difference {max_difference:.6f} (tolerance {tolerance}), "
+        f"top label agreement {top_label_agreement:.1%} -> {'passed' if passed else 'FAILED'}"
+    )
+    return passed
+
+
+def benchmark(texts: List[str], batch_sizes: List[int], repeats: int) -> None:
+    """
+    Measure the throughput of the reference pipeline and the inference backend
+    """
+    for name, classify in [
+        ("reference", get_reference_classification),
+        (
+            f"{CLASSIFICATION_BACKEND}{' int8' if CLASSIFICATION_QUANTIZE else ''}",
+            get_classification,
+        ),
+    ]:
+        for batch_size in batch_sizes:
+            classify(texts[:batch_size], batch_size)  # warmup
+            start = time.perf_counter()
+            for _ in range(repeats):
+                classify(texts, batch_size)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:>20} batch size {batch_size:>3}: "
+                f"{len(texts) * repeats / elapsed:8.1f} texts/s"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check the parity of the classification backend with the reference pipeline and benchmark it, "
+        "the backend is selected with CLASSIFICATION_BACKEND and CLASSIFICATION_QUANTIZE"
+    )
+    parser.add_argument(
+        "--texts",
+        help="file with one text per line, defaults to built-in sample texts",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=None,
+        help="maximum score difference, defaults to 1e-4 (0.05 with int8 quantization)",
+    )
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as file:
+            texts = [line.strip() for line in file if line.strip()]
+    else:
+        texts = SAMPLE_TEXTS * 4
+    tolerance = args.tolerance
+    if tolerance is None:
+        tolerance = 0.05 if CLASSIFICATION_QUANTIZE else 1e-4
+
+    globals.init_globals()
+    load_classification_model()
+
+    passed = check_parity(texts, tolerance)
+    benchmark(texts, args.batch_sizes, args.repeats)
+    sys.exit(0 if passed else 1)
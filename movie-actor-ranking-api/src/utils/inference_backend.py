@@ -0,0 +1,168 @@
+import os
+import numpy as np
+import torch
+from transformers import PreTrainedModel, PreTrainedTokenizer
+from config import (
+    CLASSIFICATION_MODEL_NAME,
+    CLASSIFICATION_BACKEND,
+    CLASSIFICATION_QUANTIZE,
+    CLASSIFICATION_INTRA_OP_THREADS,
+    CLASSIFICATION_ONNX_PATH,
+)
+
+BACKENDS = ["pytorch", "torchscript", "onnx"]
+ONNX_OPSET_VERSION = 14
+
+
+class LogitsModule(torch.nn.Module):
+    """
+    Wrap a sequence classification model, so it only takes tensors and only returns the logits
+    """
+
+    def __init__(self, model: PreTrainedModel):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+class TorchBackend:
+    """
+    Run the model eagerly with pytorch, optionally with the linear layers quantized to int8.
+    The model is quantized in place, so no fp32 copy of the weights is kept.
+    """
+
+    def __init__(self, model: PreTrainedModel, quantize: bool):
+        self.module = LogitsModule(model).eval()
+        if quantize:
+            self.module = torch.quantization.quantize_dynamic(
+                self.module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+            )
+
+    def run(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        with torch.inference_mode():
+            return self.module(
+                torch.from_numpy(input_ids), torch.from_numpy(attention_mask)
+            ).numpy()
+
+
+class TorchScriptBackend(TorchBackend):
+    """
+    Run the model traced with TorchScript, optionally with the linear layers quantized to int8
+    """
+
+    def __init__(
+        self, model: PreTrainedModel, tokenizer: PreTrainedTokenizer, quantize: bool
+    ):
+        super().__init__(model, quantize)
+        example = tokenizer(["an example input"], return_tensors="pt")
+        with torch.inference_mode():
+            self.module = torch.jit.freeze(
+                torch.jit.trace(
+                    self.module, (example["input_ids"], example["attention_mask"])
+                )
+            )
+
+
+class OnnxBackend:
+    """
+    Run the model exported to ONNX with ONNX Runtime, optionally with the weights quantized to int8.
+    The exported model is stored in CLASSIFICATION_ONNX_PATH and reused,
+    the torch model is not referenced once the session exists.
+    """
+
+    def __init__(
+        self, model: PreTrainedModel, tokenizer: PreTrainedTokenizer, quantize: bool
+    ):
+        import onnxruntime
+
+        model_path = export_onnx_model(model, tokenizer, quantize)
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = CLASSIFICATION_INTRA_OP_THREADS
+        session_options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        self.session = onnxruntime.InferenceSession(
+            model_path, session_options, providers=["CPUExecutionProvider"]
+        )
+
+    def run(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        return self.session.run(
+            ["logits"],
+            {
+                "input_ids": input_ids.astype(np.int64),
+                "attention_mask": attention_mask.astype(np.int64),
+            },
+        )[0]
+
+
+def export_onnx_model(
+    model: PreTrainedModel, tokenizer: PreTrainedTokenizer, quantize: bool
+) -> str:
+    """
+    Export the model to ONNX, if it is not exported yet, and return the path of the file
+    """
+    file_name = CLASSIFICATION_MODEL_NAME.replace("/", "--")
+    model_path = os.path.join(CLASSIFICATION_ONNX_PATH, file_name + ".onnx")
+    quantized_model_path = os.path.join(CLASSIFICATION_ONNX_PATH, file_name + "-int8.onnx")
+
+    if not os.path.exists(model_path):
+        os.makedirs(CLASSIFICATION_ONNX_PATH, exist_ok=True)
+        example = tokenizer(["an example input"], return_tensors="pt")
+        temporary_model_path = model_path + ".tmp"
+        torch.onnx.export(
+            LogitsModule(model).eval(),
+            (example["input_ids"], example["attention_mask"]),
+            temporary_model_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=ONNX_OPSET_VERSION,
+        )
+        os.replace(temporary_model_path, model_path)
+        print(f"Classification model exported to {model_path}")
+
+    if not quantize:
+        return model_path
+
+    if not os.path.exists(quantized_model_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        temporary_model_path = quantized_model_path + ".tmp"
+        quantize_dynamic(model_path, temporary_model_path, weight_type=QuantType.QInt8)
+        os.replace(temporary_model_path, quantized_model_path)
+        print(f"Quantized classification model stored in {quantized_model_path}")
+    return quantized_model_path
+
+
+def load_inference_backend(
+    model: PreTrainedModel,
+    tokenizer: PreTrainedTokenizer,
+    backend: str = CLASSIFICATION_BACKEND,
+    quantize: bool = CLASSIFICATION_QUANTIZE,
+):
+    """
+    Create the inference backend of the classification model, every backend takes
+    padded input ids and attention masks and returns the logits
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown classification backend {backend}, expected one of {BACKENDS}")
+
+    if CLASSIFICATION_INTRA_OP_THREADS > 0:
+        torch.set_num_threads(CLASSIFICATION_INTRA_OP_THREADS)
+
+    if backend == "onnx":
+        inference_backend = OnnxBackend(model, tokenizer, quantize)
+    elif backend == "torchscript":
+        inference_backend = TorchScriptBackend(model, tokenizer, quantize)
+    else:
+        inference_backend = TorchBackend(model, quantize)
+
+    print(f"Classification backend: {backend}{' int8' if quantize else ''}")
+    return inference_backend
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Tuple
+import globals
+from config import INFERENCE_THREADS, INFERENCE_MAX_QUEUE_DEPTH
+
+# timings of the last inference of the current request, in milliseconds
+inference_timings: ContextVar[Dict[str, float]] = ContextVar("inference_timings")
+
+pending_inferences = 0  # queued and running inferences of this worker
+
+
+class InferenceQueueFullError(Exception):
+    """
+    Raised when more inferences are pending than INFERENCE_MAX_QUEUE_DEPTH
+    """
+
+
+def init_inference_executor() -> ThreadPoolExecutor:
+    """
+    Start the thread pool that runs the model inference off the event loop
+    """
+    globals._inference_executor = ThreadPoolExecutor(
+        max_workers=INFERENCE_THREADS, thread_name_prefix="inference"
+    )
+    return globals._inference_executor
+
+
+def shutdown_inference_executor() -> None:
+    """
+    Stop the inference thread pool
+    """
+    if globals._inference_executor is not None:
+        globals._inference_executor.shutdown(wait=True)
+        globals._inference_executor = None
+
+
+async def run_inference(func: Callable, *args: Any) -> Tuple[Any, Dict[str, float]]:
+    """
+    Run a blocking inference function in the inference thread pool and await the result.
+    Raises InferenceQueueFullError instead of queueing more than INFERENCE_MAX_QUEUE_DEPTH inferences.
+
+    :return: the result and the queue wait and inference time in milliseconds
+    """
+    global pending_inferences
+
+    if pending_inferences >= INFERENCE_MAX_QUEUE_DEPTH:
+        raise InferenceQueueFullError(
+            f"{pending_inferences} inferences are already pending"
+        )
+
+    if globals._inference_executor is None:
+        init_inference_executor()
+
+    def timed_inference():
+        started = time.perf_counter()
+        result = func(*args)
+        return result, started, time.perf_counter()
+
+    pending_inferences += 1
+    submitted = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        result, started, finished = await loop.run_in_executor(
+            globals._inference_executor, timed_inference
+        )
+    finally:
+        pending_inferences -= 1
+
+    timings = {
+        "queue": (started - submitted) * 1000,
+        "inference": (finished - started) * 1000,
+    }
+    inference_timings.set(timings)
+    return result, timings
@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """
+    In-process cache with a maximum size and an optional time to live.
+    The least recently used entry is evicted once the cache is full.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        """
+        :param max_size: maximum number of entries
+        :param ttl: seconds an entry stays valid, None for no expiry
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get the value of a key, None if it is missing or expired
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self.entries[key]
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value and evict the least recently used entries if the cache is full
+        """
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Remove a key from the cache
+        """
+        self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset the counters
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> dict:
+        """
+        Get the size and the hit/miss counters of the cache
+        """
+        requests = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests > 0 else 0,
+        }
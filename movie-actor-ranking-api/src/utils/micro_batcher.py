@@ -0,0 +1,157 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from utils.classification import get_classification
+from utils.inference_executor import (
+    InferenceQueueFullError,
+    inference_timings,
+    run_inference,
+)
+from config import (
+    MICRO_BATCH_WINDOW_MS,
+    MICRO_BATCH_MAX_SIZE,
+    INFERENCE_THREADS,
+    INFERENCE_MAX_QUEUE_DEPTH,
+)
+
+# texts waiting for a batch, bounded by INFERENCE_MAX_QUEUE_DEPTH * MICRO_BATCH_MAX_SIZE
+batch_queue: Optional[asyncio.Queue] = None
+batcher_task: Optional[asyncio.Task] = None
+batch_tasks: Set[asyncio.Task] = set()  # batches running in the inference threads
+
+
+def start_micro_batcher() -> None:
+    """
+    Start the background task that collects the queries into batches
+    """
+    global batch_queue, batcher_task
+    batch_queue = asyncio.Queue(maxsize=INFERENCE_MAX_QUEUE_DEPTH * MICRO_BATCH_MAX_SIZE)
+    batcher_task = asyncio.get_running_loop().create_task(run_micro_batcher())
+
+
+async def stop_micro_batcher() -> None:
+    """
+    Stop the background batching task
+    """
+    global batcher_task
+    if batcher_task is not None:
+        batcher_task.cancel()
+        try:
+            await batcher_task
+        except asyncio.CancelledError:
+            pass
+        batcher_task = None
+    for task in list(batch_tasks):
+        task.cancel()
+    await asyncio.gather(*batch_tasks, return_exceptions=True)
+
+
+async def get_batched_classification(texts: List[str]) -> List[List[dict]]:
+    """
+    Classify the texts together with the texts of other requests arriving within MICRO_BATCH_WINDOW_MS.
+    Raises InferenceQueueFullError if too many texts are waiting.
+    """
+    if batcher_task is None:
+        start_micro_batcher()
+
+    future = asyncio.get_running_loop().create_future()
+    try:
+        batch_queue.put_nowait((texts, future, time.perf_counter()))
+    except asyncio.QueueFull:
+        raise InferenceQueueFullError(f"{batch_queue.qsize()} queries are already waiting")
+
+    classifications, timings = await future
+    # the inference ran in the batcher task, expose its timings to this request
+    inference_timings.set(timings)
+    return classifications
+
+
+async def run_micro_batcher() -> None:
+    """
+    Collect queued texts for up to MICRO_BATCH_WINDOW_MS or MICRO_BATCH_MAX_SIZE texts,
+    classify them as one padded batch and hand the results back to the waiting requests.
+    Up to INFERENCE_THREADS batches run at once, while all threads are busy the texts
+    wait in the queue and requests are rejected once it is full.
+    """
+    loop = asyncio.get_running_loop()
+    inference_slots = asyncio.Semaphore(INFERENCE_THREADS)
+
+    while True:
+        # only start a batch once an inference thread is free
+        await inference_slots.acquire()
+        batch = []
+        dispatched = False
+        try:
+            batch.append(await batch_queue.get())
+            batch_size = len(batch[0][0])
+            deadline = loop.time() + MICRO_BATCH_WINDOW_MS / 1000
+
+            # fill the batch until the window closes or the batch is full
+            while batch_size < MICRO_BATCH_MAX_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(batch_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                batch_size += len(item[0])
+
+            task = loop.create_task(classify_batch(batch))
+            batch_tasks.add(task)
+
+            def release_slot(finished_task: asyncio.Task) -> None:
+                batch_tasks.discard(finished_task)
+                inference_slots.release()
+
+            task.add_done_callback(release_slot)
+            dispatched = True
+        finally:
+            if not dispatched:
+                # stopped while collecting, the collected requests must not wait forever
+                fail_batch(batch, RuntimeError("The micro batcher stopped"))
+                inference_slots.release()
+
+
+async def classify_batch(
+    batch: List[Tuple[List[str], asyncio.Future, float]]
+) -> None:
+    """
+    Classify all texts of the batch at once and fan the results out to the requests
+    """
+    texts = [text for item_texts, _, _ in batch for text in item_texts]
+    dispatched = time.perf_counter()
+
+    try:
+        classifications, timings = await run_inference(
+            get_classification, texts, len(texts)
+        )
+    except asyncio.CancelledError:
+        fail_batch(batch, RuntimeError("The micro batcher stopped"))
+        raise
+    except Exception as e:
+        fail_batch(batch, e)
+        return
+
+    start = 0
+    for item_texts, future, enqueued in batch:
+        end = start + len(item_texts)
+        if not future.done():  # the request may have been cancelled
+            item_timings: Dict[str, float] = {
+                "batch": (dispatched - enqueued) * 1000,
+                **timings,
+            }
+            future.set_result((classifications[start:end], item_timings))
+        start = end
+
+
+def fail_batch(
+    batch: List[Tuple[List[str], asyncio.Future, float]], exception: Exception
+) -> None:
+    """
+    Raise the exception in the requests of the batch that are still waiting
+    """
+    for _, future, _ in batch:
+        if not future.done():
+            future.set_exception(exception)
@@ -0,0 +1,80 @@
+from typing import List, Optional
+from urllib.parse import urlparse
+from utils.lru_cache import LRUCache
+from config import (
+    QUERY_CACHE_MAX_SIZE,
+    QUERY_CACHE_TTL,
+    QUERY_CACHE_REDIS_URL,
+)
+
+# query vectors of this worker
+local_cache = LRUCache(max_size=QUERY_CACHE_MAX_SIZE, ttl=QUERY_CACHE_TTL)
+# optional cache shared by all workers
+shared_cache = None
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize the query text, so equal queries share one cache entry
+    """
+    return " ".join(query.lower().split())
+
+
+def get_shared_cache():
+    """
+    Connect to the shared redis cache, if QUERY_CACHE_REDIS_URL is set
+    """
+    global shared_cache
+    if shared_cache is None and QUERY_CACHE_REDIS_URL:
+        from aiocache import Cache
+        from aiocache.serializers import JsonSerializer
+
+        url = urlparse(QUERY_CACHE_REDIS_URL)
+        shared_cache = Cache(
+            Cache.REDIS,
+            endpoint=url.hostname,
+            port=url.port or 6379,
+            password=url.password,
+            namespace="query_vector",
+            serializer=JsonSerializer(),
+        )
+    return shared_cache
+
+
+async def get_cached_query_vector(query: str) -> Optional[List[float]]:
+    """
+    Get the query vector of a query from the local cache, then from the shared cache
+    """
+    key = normalize_query(query)
+
+    query_vector = local_cache.get(key)
+    if query_vector is not None:
+        return query_vector
+
+    cache = get_shared_cache()
+    if cache is not None:
+        try:
+            query_vector = await cache.get(key)
+        except Exception as e:
+            print(f"An error occurred while reading the shared query cache: {e}")
+            return None
+        if query_vector is not None:
+            local_cache.set(key, query_vector)
+
+    return query_vector
+
+
+async def cache_query_vector(query: str, query_vector: List[float]) -> None:
+    """
+    Store the query vector of a query in the local and the shared cache
+    """
+    key = normalize_query(query)
+    query_vector = [float(value) for value in query_vector]
+    local_cache.set(key, query_vector)
+
+    cache = get_shared_cache()
+    if cache is not None:
+        try:
+            await cache.set(key, query_vector, ttl=QUERY_CACHE_TTL)
+        except Exception as e:
+            print(f"An error occurred while writing the shared query cache: {e}")
@@ -0,0 +1,124 @@
+import os
+import shutil
+import sys
+
+import nltk
+from filelock import FileLock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from config import (
+    CLASSIFICATION_MODEL_NAME,
+    CLASSIFICATION_MODEL_REVISION,
+    MODEL_CACHE_PATH,
+    NLTK_DATA_PATH,
+)
+
+# nltk resource -> path of the resource in the nltk data directory
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "wordnet": "corpora/wordnet",
+    "stopwords": "corpora/stopwords",
+    "words": "corpora/words",
+}
+
+
+def add_nltk_data_path() -> None:
+    """
+    Look up the nltk resources in NLTK_DATA_PATH first
+    """
+    if NLTK_DATA_PATH not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_PATH)
+
+
+def ensure_nltk_resources() -> None:
+    """
+    Download the nltk resources to NLTK_DATA_PATH, only the missing ones are downloaded.
+    The lock makes the processes of a host download them only once.
+    """
+    add_nltk_data_path()
+    os.makedirs(NLTK_DATA_PATH, exist_ok=True)
+    with FileLock(os.path.join(NLTK_DATA_PATH, ".lock")):
+        for resource, resource_path in NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(resource_path)
+            except LookupError:
+                nltk.download(resource, download_dir=NLTK_DATA_PATH)
+
+
+def get_model_path() -> str:
+    """
+    Get the local directory of the pinned revision of the classification model
+    """
+    return os.path.join(
+        MODEL_CACHE_PATH,
+        CLASSIFICATION_MODEL_NAME.replace("/", "--"),
+        CLASSIFICATION_MODEL_REVISION,
+    )
+
+
+def resolve_model_path() -> str:
+    """
+    Get the local directory of the classification model, it is downloaded from the
+    Hugging Face model hub only if it is missing. The weights are stored as safetensors,
+    so they are memory-mapped when loading. The lock makes the processes of a host
+    download them only once.
+    """
+    model_path = get_model_path()
+    if is_model_stored(model_path):
+        return model_path
+
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    with FileLock(model_path + ".lock"):
+        # another process may have stored the model while waiting for the lock
+        if is_model_stored(model_path):
+            return model_path
+
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        print(
+            f"Downloading {CLASSIFICATION_MODEL_NAME} ({CLASSIFICATION_MODEL_REVISION}) to {model_path}"
+        )
+        temporary_path = model_path + ".tmp"
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        download_path = os.path.join(temporary_path, "download")
+
+        tokenizer = AutoTokenizer.from_pretrained(
+            CLASSIFICATION_MODEL_NAME,
+            revision=CLASSIFICATION_MODEL_REVISION,
+            cache_dir=download_path,
+        )
+        model = AutoModelForSequenceClassification.from_pretrained(
+            CLASSIFICATION_MODEL_NAME,
+            revision=CLASSIFICATION_MODEL_REVISION,
+            cache_dir=download_path,
+        )
+        tokenizer.save_pretrained(temporary_path)
+        model.save_pretrained(temporary_path, safe_serialization=True)
+        shutil.rmtree(download_path)
+
+        # swap in the model only once it is complete
+        shutil.rmtree(model_path, ignore_errors=True)
+        os.rename(temporary_path, model_path)
+
+    return model_path
+
+
+def is_model_stored(model_path: str) -> bool:
+    """
+    Check if the model and its tokenizer are stored in the directory
+    """
+    return os.path.exists(os.path.join(model_path, "config.json")) and os.path.exists(
+        os.path.join(model_path, "model.safetensors")
+    )
+
+
+def prepare_resources() -> None:
+    """
+    Store the nltk resources and the classification model on the host
+    """
+    ensure_nltk_resources()
+    resolve_model_path()
+
+
+if __name__ == "__main__":
+    prepare_resources()
@@ -0,0 +1,137 @@
+import os
+import struct
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+VOCABULARY_MAGIC = b"VOCB"
+VOCABULARY_FORMAT_VERSION = 1
+# magic, format version, number of terms, length of the encoded terms
+VOCABULARY_HEADER = struct.Struct("<4sIQQ")
+
+
+class Vocabulary:
+    """
+    Terms with stable ids and their counts.
+    The ids are assigned in insertion order and index the counts array.
+    """
+
+    def __init__(
+        self, terms: Optional[List[str]] = None, counts: Optional[np.ndarray] = None
+    ):
+        """
+        :param terms: terms in the order of their ids
+        :param counts: count of every term, zeros if not given
+        """
+        self.terms = list(terms) if terms is not None else []
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.terms)}
+        self.counts = (
+            np.array(counts, dtype=np.int64)
+            if counts is not None
+            else np.zeros(len(self.terms), dtype=np.int64)
+        )
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.term_ids
+
+    def get_id(self, term: str) -> Optional[int]:
+        """
+        Get the id of a term, None if it is not in the vocabulary
+        """
+        return self.term_ids.get(term)
+
+    def count_term_ids(self, tokens: Iterable[str]) -> Dict[int, int]:
+        """
+        Count the tokens that are in the vocabulary
+
+        :return: term id -> count
+        """
+        term_ids = self.term_ids
+        return {
+            term_ids[term]: count
+            for term, count in Counter(tokens).items()
+            if term in term_ids
+        }
+
+    def add_tokens(self, tokens: Iterable[str]) -> None:
+        """
+        Add the tokens to the counts, new terms get the next free ids
+        """
+        term_counts = Counter(tokens)
+        new_terms = [term for term in term_counts if term not in self.term_ids]
+        if new_terms:
+            for term in new_terms:
+                self.term_ids[term] = len(self.terms)
+                self.terms.append(term)
+            self.counts = np.concatenate(
+                [self.counts, np.zeros(len(new_terms), dtype=np.int64)]
+            )
+
+        term_ids = np.fromiter(
+            (self.term_ids[term] for term in term_counts),
+            dtype=np.int64,
+            count=len(term_counts),
+        )
+        self.counts[term_ids] += np.fromiter(
+            term_counts.values(), dtype=np.int64, count=len(term_counts)
+        )
+
+    def prune(self, min_count: int) -> "Vocabulary":
+        """
+        Get a new vocabulary of the terms counted at least min_count times, with consecutive ids
+        """
+        kept = np.flatnonzero(self.counts >= min_count)
+        return Vocabulary([self.terms[term_id] for term_id in kept], self.counts[kept])
+
+    def save(self, file_path: str) -> None:
+        """
+        Store the vocabulary in the binary format: header, counts as int64 and the newline separated terms
+        """
+        encoded_terms = "\n".join(self.terms).encode("utf-8")
+        temporary_file_path = file_path + ".tmp"
+        with open(temporary_file_path, "wb") as file:
+            file.write(
+                VOCABULARY_HEADER.pack(
+                    VOCABULARY_MAGIC,
+                    VOCABULARY_FORMAT_VERSION,
+                    len(self.terms),
+                    len(encoded_terms),
+                )
+            )
+            file.write(self.counts.astype("<i8").tobytes())
+            file.write(encoded_terms)
+        # replace the old file only once the new one is complete
+        os.replace(temporary_file_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: str) -> Optional["Vocabulary"]:
+        """
+        Load a vocabulary from the binary format, None if the file is missing or invalid
+        """
+        if not os.path.exists(file_path):
+            return None
+
+        with open(file_path, "rb") as file:
+            content = file.read()
+
+        if len(content) < VOCABULARY_HEADER.size:
+            print(f"Vocabulary file {file_path} is invalid")
+            return None
+        magic, version, term_count, terms_length = VOCABULARY_HEADER.unpack_from(content)
+        counts_end = VOCABULARY_HEADER.size + term_count * 8
+        if (
+            magic != VOCABULARY_MAGIC
+            or version != VOCABULARY_FORMAT_VERSION
+            or len(content) != counts_end + terms_length
+        ):
+            print(f"Vocabulary file {file_path} is invalid")
+            return None
+
+        counts = np.frombuffer(
+            content, dtype="<i8", count=term_count, offset=VOCABULARY_HEADER.size
+        )
+        terms = content[counts_end:].decode("utf-8").split("\n") if term_count else []
+        return cls(terms, counts)